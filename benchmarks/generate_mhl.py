@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Writes a pair of synthetic MHLs, for benchmarking mhl-compare on lists much larger than samples/.
+# The 1st is the original, the 2nd is a later copy of it with some files renamed, moved, changed,
+# missing or added. Everything is random but seeded, so the same arguments give the same files.
+#
+#   python benchmarks/generate_mhl.py 100000 /tmp/bench --renamed 0.01 --moved 0.01
+
+import os
+import random
+import collections
+import argparse
+
+SCENARIOS = {
+    # Two copies that match perfectly
+    'identical': {},
+    # What a shuttle drive or tape usually looks like against the card it came from
+    'typical': {
+        'md5Only': 0.05, 'xxhashOnly': 0.6, 'duplicates': 0.01,
+        'renamed': 0.005, 'moved': 0.005, 'changed': 0.001, 'missing': 0.002, 'added': 0.002,
+        'dropMd5': 0.3,
+    },
+    # Someone reorganised all of the folders
+    'reorganised': {
+        'xxhashOnly': 0.5, 'moved': 0.5, 'renamed': 0.1, 'missing': 0.01, 'added': 0.01,
+    },
+    # Plain lists of checksums rather than MHLs
+    'plain': {
+        'plain': True, 'renamed': 0.005, 'moved': 0.005, 'changed': 0.001, 'missing': 0.002, 'added': 0.002,
+    },
+}
+
+FILES_PER_FOLDER = 500
+# How many of the files listed last a duplicate can be a copy of
+DUPLICATE_POOL = 1000
+# Increase whenever the files written change, so that benchmarks/data is written again
+VERSION = 2
+
+TEMPLATE_HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
+<hashlist version="1.1">
+  <creatorinfo>
+    <name>{name}</name>
+    <username>benchmark</username>
+    <hostname>benchmark</hostname>
+    <tool>mhl-compare benchmark generator</tool>
+    <startdate>2020-03-21T09:00:00</startdate>
+    <finishdate>2020-03-21T17:00:00</finishdate>
+  </creatorinfo>
+'''
+TEMPLATE_FOOTER = '</hashlist>\n'
+
+
+def createEntries(count, rng, settings, first=0, folder=''):
+    # The files on the original card, one at a time: [ path, size, { hash type: hash } ]
+    # Numbered from first, so that files made later (e.g. added to the copy) don't share names with these.
+    md5Only = settings.get('md5Only', 0)
+    xxhashOnly = settings.get('xxhashOnly', 0)
+    duplicates = settings.get('duplicates', 0)
+    # Duplicates are copies of files listed shortly before, so only those are kept
+    recent = collections.deque(maxlen=DUPLICATE_POOL)
+    for i in range(first, first + count):
+        path = folder + 'A{:03d}/CLIP/A{:03d}C{:06d}_200321_R1AB.MOV'.format( i // FILES_PER_FOLDER, i // FILES_PER_FOLDER, i )
+        if recent and rng.random() < duplicates:
+            # Same content as a file already listed, under another name
+            original = rng.choice(recent)
+            yield [ path, original[1], dict(original[2]) ]
+            continue
+        hashes = {}
+        roll = rng.random()
+        if roll >= md5Only:
+            hashes['xxhash64be'] = '{:016x}'.format( rng.getrandbits(64) )
+        if roll < md5Only or roll >= md5Only + xxhashOnly:
+            hashes['md5'] = '{:032x}'.format( rng.getrandbits(128) )
+        entry = [ path, rng.randrange(1, 4 * 1024 ** 3), hashes ]
+        recent.append(entry)
+        yield entry
+
+
+def copyEntry(entry, rng, settings):
+    # The same file as it was listed on a later copy, or None if it is missing from it
+    path, size, hashes = entry
+    if rng.random() < settings.get('missing', 0):
+        return None
+    hashes = dict(hashes)
+    if rng.random() < settings.get('renamed', 0):
+        directory, filename = os.path.split(path)
+        stem, extension = os.path.splitext(filename)
+        path = directory + '/' + stem + '_V2' + extension
+    if rng.random() < settings.get('moved', 0):
+        path = 'MOVED/' + path
+    if rng.random() < settings.get('changed', 0):
+        for hashType in hashes:
+            hashes[hashType] = '{:0{}x}'.format( rng.getrandbits(4 * len(hashes[hashType])), len(hashes[hashType]) )
+    if 'md5' in hashes and len(hashes) > 1 and rng.random() < settings.get('dropMd5', 0):
+        # Some software only records the one hash
+        del hashes['md5']
+    return [ path, size, hashes ]
+
+
+def formatMHLEntry(entry):
+    path, size, hashes = entry
+    hashLines = ''.join( '    <{0}>{1}</{0}>\n'.format(hashType, value) for hashType, value in hashes.items() )
+    return (
+        '  <hash>\n'
+        '    <file>{}</file>\n'
+        '    <size>{}</size>\n'
+        '    <creationdate>2020-03-21T08:12:40Z</creationdate>\n'
+        '    <lastmodificationdate>2020-03-21T08:12:40</lastmodificationdate>\n'
+        '{}'
+        '    <hashdate>2020-03-21T09:30:02Z</hashdate>\n'
+        '  </hash>\n'.format(path, size, hashLines)
+    )
+
+
+def formatPlainEntry(entry):
+    path, size, hashes = entry
+    if 'xxhash64be' in hashes:
+        return '{}  {}\n'.format(hashes['xxhash64be'], path)
+    return '{} *{}\n'.format(hashes['md5'], path)
+
+
+def generate(count, directory, settings, seed=0):
+    # Gives back the paths of the two files written.
+    # Both are written as the entries are made, so this takes the same memory however many there are.
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    if settings.get('plain'):
+        filepaths = [ os.path.join(directory, name) for name in ( 'a.xxhash', 'b.xxhash' ) ]
+        headers = ( '', '' )
+        footer = ''
+        formatEntry = formatPlainEntry
+    else:
+        filepaths = [ os.path.join(directory, name) for name in ( 'a.mhl', 'b.mhl' ) ]
+        headers = ( TEMPLATE_HEADER.format(name='CARD'), TEMPLATE_HEADER.format(name='SHUTTLE') )
+        footer = TEMPLATE_FOOTER
+        formatEntry = formatMHLEntry
+
+    with open(filepaths[0], 'w', encoding='utf-8', buffering=1024 * 1024) as fileA, \
+            open(filepaths[1], 'w', encoding='utf-8', buffering=1024 * 1024) as fileB:
+        fileA.write( headers[0] )
+        fileB.write( headers[1] )
+        for entry in createEntries(count, rng, settings):
+            fileA.write( formatEntry(entry) )
+            copied = copyEntry(entry, rng, settings)
+            if copied is not None:
+                fileB.write( formatEntry(copied) )
+        # Files only on the copy, numbered after the originals so none of them share a name
+        added = int( count * settings.get('added', 0) )
+        for entry in createEntries(added, rng, {}, first=count, folder='ADDED/'):
+            fileB.write( formatEntry(entry) )
+        fileA.write(footer)
+        fileB.write(footer)
+    return filepaths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a pair of synthetic MHLs to benchmark with")
+    parser.add_argument( "COUNT", type=int, help="How many files the 1st MHL lists")
+    parser.add_argument( "DIRECTORY", help="Where to write the two files")
+    parser.add_argument( "--scenario", choices=sorted(SCENARIOS), default='typical', help="Starting point for the settings below")
+    parser.add_argument( "--seed", type=int, default=0)
+    parser.add_argument( "--plain", action="store_true", default=None, help="Write plain lists of checksums instead of MHLs")
+    for setting, description in [
+            ('md5Only', 'Share of files with only an MD5'),
+            ('xxhashOnly', 'Share of files with only an xxHash (the rest have both)'),
+            ('duplicates', 'Share of files with the same content as another'),
+            ('renamed', 'Share of files renamed in the 2nd'),
+            ('moved', 'Share of files moved to another folder in the 2nd'),
+            ('changed', 'Share of files whose hashes are different in the 2nd'),
+            ('missing', 'Share of files missing from the 2nd'),
+            ('added', 'Share of files only in the 2nd'),
+            ('dropMd5', 'Share of files with both hashes where the 2nd only lists the xxHash')]:
+        parser.add_argument( "--" + setting, type=float, default=None, help=description )
+    args = parser.parse_args()
+
+    settings = dict( SCENARIOS[args.scenario] )
+    for setting, value in vars(args).items():
+        if value is not None and setting not in ( 'COUNT', 'DIRECTORY', 'scenario', 'seed' ):
+            settings[setting] = value
+
+    for filepath in generate(args.COUNT, args.DIRECTORY, settings, seed=args.seed):
+        print(filepath)
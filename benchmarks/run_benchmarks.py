@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Times each phase of a comparison on synthetic MHLs of increasing size, so that
+# anything which grows faster than the lists do shows up as numbers.
+#
+#   python benchmarks/run_benchmarks.py
+#   python benchmarks/run_benchmarks.py --sizes 1000000 10000000 --scenarios typical
+#
+# Generated MHLs are kept in benchmarks/data/ and reused. Results are printed and
+# also saved to benchmarks/results/, one JSON file per run.
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+from datetime import datetime
+
+import generate_mhl
+
+BENCHMARKS_DIRECTORY = os.path.dirname( os.path.abspath(__file__) )
+DATA_DIRECTORY = os.path.join(BENCHMARKS_DIRECTORY, 'data')
+RESULTS_DIRECTORY = os.path.join(BENCHMARKS_DIRECTORY, 'results')
+
+# The lib package, from the copy of mhl-compare this is in
+sys.path.insert( 0, os.path.dirname(BENCHMARKS_DIRECTORY) )
+import lib
+from lib import settings
+
+PHASES = [ 'parse', 'index', 'join', 'report' ]
+
+
+def prepareData(scenario, count, seed):
+    directory = os.path.join( DATA_DIRECTORY, '{}-{}-{}-v{}'.format(scenario, count, seed, generate_mhl.VERSION) )
+    settings = generate_mhl.SCENARIOS[scenario]
+    names = ( 'a.xxhash', 'b.xxhash' ) if settings.get('plain') else ( 'a.mhl', 'b.mhl' )
+    filepaths = [ os.path.join(directory, name) for name in names ]
+    if not all( os.path.isfile(filepath) for filepath in filepaths ):
+        filepaths = generate_mhl.generate(count, directory, settings, seed=seed)
+    return filepaths
+
+
+def runOnce(filepaths, verbose):
+    timings = {}
+
+    start = time.perf_counter()
+    mhlA = lib.MHL(filepaths[0])
+    mhlB = lib.MHL(filepaths[1])
+    timings['parse'] = time.perf_counter() - start
+
+    # Build the lookup tables that the search for moved and renamed files uses.
+    # Otherwise they are built the first time they are needed, in the middle of the report.
+    start = time.perf_counter()
+    for mhl in ( mhlA, mhlB ):
+        mhl.findHashByAttribute('filename', None)
+        mhl.findHashByAttribute( ( 'size', 'filename' ), None )
+        mhl.findHashByAttribute( ( 'size', 'stem' ), None )
+        for hashType in settings.HASH_TYPES_ACCEPTABLE:
+            mhl.findByOtherHash(hashType, None)
+    timings['index'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compare = lib.Comparison(mhlA, mhlB)
+    timings['join'] = time.perf_counter() - start
+
+    settings.LOG_VERBOSE = verbose
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        compare.printInfo()
+        compare.checkCommon()
+        compare.checkDelta('A')
+        compare.checkDelta('B')
+        compare.printCount()
+    timings['report'] = time.perf_counter() - start
+    settings.LOG_VERBOSE = False
+
+    timings['total'] = sum( timings[phase] for phase in PHASES )
+    return timings, { 'entriesA': mhlA.count(), 'entriesB': mhlB.count(), 'counts': dict(compare.COUNT) }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time mhl-compare on synthetic MHLs")
+    parser.add_argument( "--sizes", type=int, nargs='+', default=[ 1000, 10000, 100000 ], help="How many files in each MHL (up to 10000000)")
+    parser.add_argument( "--scenarios", nargs='+', choices=sorted(generate_mhl.SCENARIOS), default=[ 'identical', 'typical', 'reorganised', 'plain' ])
+    parser.add_argument( "--repeat", type=int, default=1, help="Run each one this many times and keep the fastest")
+    parser.add_argument( "--seed", type=int, default=0)
+    parser.add_argument( "-v", "--verbose", "--info", action="store_true", help="Time the report as if --info was given")
+    parser.add_argument( "--output", help="Where to save the results (default: a new file in benchmarks/results/)")
+    args = parser.parse_args()
+
+    # Always time the real work, not the cache
+    settings.CACHE_ENABLED = False
+    results = []
+
+    print( '{:<12} {:>10}  '.format('scenario', 'entries') + ''.join( '{:>9}'.format(phase) for phase in PHASES + [ 'total' ] ) )
+    for scenario in args.scenarios:
+        for count in args.sizes:
+            filepaths = prepareData(scenario, count, args.seed)
+            best = None
+            for i in range(args.repeat):
+                timings, details = runOnce(filepaths, args.verbose)
+                if best is None or timings['total'] < best['total']:
+                    best = timings
+            results.append({ 'scenario': scenario, 'size': count, 'seconds': best, **details })
+            print( '{:<12} {:>10}  '.format(scenario, count) + ''.join( '{:>9.3f}'.format( best[phase] ) for phase in PHASES + [ 'total' ] ) )
+
+    run = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'verbose': args.verbose,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        output = os.path.join( RESULTS_DIRECTORY, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json' )
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print('')
+    print('Results saved to', output)
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# mhl-compare as a library. Importing it has no side effects, and the heavier
+# dependencies (ElementTree, dateutil, humanize, termcolor) are only imported
+# once something needs them. Settings can be changed through lib.settings.
+
+from . import settings
+from .mhl import MHL, Hash, HashNonexistent, EmptyHashlist
+from .compare import Comparison, MultiComparison
+from .scan import VolumeComparison
+from .follow import FollowedMHL, FollowComparison
+from .sidecar import SidecarMHL
+from .verify import DiskMHL, VerifyComparison, StatComparison
+from .external import SortedComparison
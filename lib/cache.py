@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Keeping parsed MHLs on disk between runs.
+
+import os
+import pickle
+import hashlib
+
+from .settings import CACHE_FINGERPRINT_SIZE, CACHE_FORMAT
+
+
+class MHLCache:
+    # Keeps parsed MHLs on disk, so that a file which hasn't changed since it was
+    # last read can be loaded without parsing any XML or dates. An entry is only used
+    # if the file's path, size, modification time and a fingerprint of its contents
+    # all still match. Beyond the size limit, the least recently used entries are removed.
+    # The cache is only ever a shortcut: if it can't be read or written, files are parsed as usual.
+    def __init__(self, directory, sizeLimit, recordFormat=None):
+        self.directory = directory
+        self.sizeLimit = sizeLimit
+        # What the entries are stored as (Hash.RECORD_SLOTS), entries stored any other way aren't used
+        self.recordFormat = recordFormat
+
+    def entryPath(self, filepath):
+        name = hashlib.sha1( os.path.abspath(filepath).encode('utf-8', 'surrogateescape') ).hexdigest()
+        return os.path.join(self.directory, name + '.mhlcache')
+
+    def describe(self, filepath):
+        # Everything a cached entry must match to be used for this file.
+        # The fingerprint covers the start and end of the file, which is where an MHL changes.
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        fingerprint = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            fingerprint.update( f.read(CACHE_FINGERPRINT_SIZE) )
+            if stat.st_size > CACHE_FINGERPRINT_SIZE:
+                f.seek( max(CACHE_FINGERPRINT_SIZE, stat.st_size - CACHE_FINGERPRINT_SIZE) )
+                fingerprint.update( f.read() )
+        return ( CACHE_FORMAT, self.recordFormat, path, stat.st_size, stat.st_mtime_ns, fingerprint.hexdigest() )
+
+    def load(self, filepath, key):
+        # Gives back the saved state of the MHL, or None if there's no usable entry
+        entryPath = self.entryPath(filepath)
+        try:
+            with open(entryPath, 'rb') as f:
+                if pickle.load(f) != key:
+                    return None
+                state = pickle.load(f)
+            # Mark it as recently used
+            os.utime(entryPath)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A damaged entry is no worse than a missing one
+            return None
+        return state
+
+    def save(self, filepath, key, mhl):
+        entryPath = self.entryPath(filepath)
+        temporaryPath = entryPath + '.' + str(os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporaryPath, 'wb') as f:
+                pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(mhl.__getstate__(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Only ever replace a whole entry, so a reader never sees half of one
+            os.replace(temporaryPath, entryPath)
+            self.evict()
+        except OSError:
+            try:
+                os.remove(temporaryPath)
+            except OSError:
+                pass
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.mhlcache'):
+                    stat = entry.stat()
+                    entries.append( (stat.st_mtime, stat.st_size, entry.path) )
+        total = sum( size for mtime, size, path in entries )
+        for mtime, size, path in sorted(entries):
+            if total <= self.sizeLimit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,865 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Comparing the entries of two, or more, MHLs.
+
+import operator
+
+from . import settings
+from .settings import (
+    COMPARE_FOLDER_MOVE_MINIMUM,
+    COMPARE_FOLDER_MOVE_SUMMARY,
+    COMPARE_VECTORISE_MINIMUM,
+    LOG_COLOR_MHL_A,
+    LOG_COLOR_MHL_B,
+    LOG_COLORS_MHL,
+    LOG_COLOR_WARNING,
+    LOG_COLOR_INFORMATION,
+    LOG_COLOR_BOLD,
+)
+from .mhl import HashNonexistent, fieldNames, FIELD_FILENAME, FIELD_DIRECTORY, FIELD_SIZE, FIELD_LASTMODIFICATIONDATE, FIELD_HASHES
+from .output import showDate, humanSize, showDigest, ordinal, logDetail, logRecord, color
+
+
+def importNumpy():
+    # NumPy is optional. Without it, everything is checked one pair at a time.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def folderMove(directoryA, directoryB, inside=False):
+    # Which folder became which, for a file that was in directoryA and is now in directoryB:
+    # both paths without the folders they end in alike. E.g. DCIM/100EOS5D/A and DCIM/100CANON/A
+    # give DCIM/100EOS5D and DCIM/100CANON, while A001/CLIP and MOVED/A001/CLIP give / and MOVED.
+    # With inside, a folder moved into (or out of) another stays named: A001 and MOVED/A001.
+    partsA = [] if directoryA == '/' else directoryA.split('/')
+    partsB = [] if directoryB == '/' else directoryB.split('/')
+    last = None
+    while partsA and partsB and partsA[-1] == partsB[-1]:
+        partsA.pop()
+        last = partsB.pop()
+    if inside and last is not None and not ( partsA and partsB ):
+        partsA.append(last)
+        partsB.append(last)
+    return '/'.join(partsA) or '/', '/'.join(partsB) or '/'
+
+
+class Comparison:
+    # Filled in by checkCommon(): { ( folder in 1st, folder in 2nd ): [ pairs in common that moved with it ] }
+    movedFolders = {}
+    # The categories for files that were only in one or the other
+    UNMATCHED = ( 'MISSING', )
+    # How far apart (in seconds) dates can be and still be the same
+    dateTolerance = 0
+
+    def __init__(self, mhlA, mhlB):
+        self.A = mhlA
+        self.B = mhlB
+
+        # Join the two lists on their hash, in one pass over each.
+        # Duplicates share the same original hash, so they queue up under it
+        # and get paired off in the order they appear in each list.
+        queuesB = {}
+        for hashB in self.B.hashes.values():
+            queuesB.setdefault(hashB.originalIdentifier, []).append(hashB)
+
+        self.common = []
+        self.deltaA = []
+        pairedB = {}
+        for hashA in self.A.hashes.values():
+            key = hashA.originalIdentifier
+            queue = queuesB.get(key)
+            paired = pairedB.get(key, 0)
+            if queue and paired < len(queue):
+                self.common.append( (hashA, queue[paired]) )
+                pairedB[key] = paired + 1
+            else:
+                self.deltaA.append(hashA)
+
+        # Whatever was not paired off from the front of each queue exists only in B
+        self.deltaB = []
+        for hashB in self.B.hashes.values():
+            key = hashB.originalIdentifier
+            if pairedB.get(key, 0) > 0:
+                pairedB[key] -= 1
+            else:
+                self.deltaB.append(hashB)
+
+        self.createCount()
+
+    def createCount(self):
+        # Define the categories of outcomes.
+        count_values = [
+            'PERFECT',  # Match hash and all filesystem attributes
+            'MINOR',  # Match hash but one or more filesystem attributes are different
+            'HASH_TYPE_DIFFERENT',  # Hash type is different, cannot be compared
+            'HASH_CHANGED',  # Hash is different, indicating a file change
+            'MISSING',  # Exists only in one list or the other
+            'DUPLICATE',  # When there are multiple files listed with exactly the same hash
+            'IMPOSSIBLE'  # For anomalies (like hash the same but size different)
+            ]
+        # Create a place to store these numbers as we go along.
+        self.COUNT = {}
+        for v in count_values:
+            self.COUNT[v] = 0
+
+    def recordFile(self, category, hash, hashOpposite, differences=( 0, 0, 0 ), letter='A'):
+        # With --json, write out how this file was classified as soon as it is known
+        if not settings.LOG_JSON:
+            return
+        changed, added, removed = differences
+        if letter == 'B':
+            # The differences were taken from the 2nd MHL's side
+            hash, hashOpposite = hashOpposite, hash
+            added, removed = removed, added
+        logRecord({
+            'type': 'file',
+            'category': category,
+            '1st': hash.report() if hash else None,
+            '2nd': hashOpposite.report() if hashOpposite else None,
+            'changed': fieldNames(changed),
+            'only1st': fieldNames(added),
+            'only2nd': fieldNames(removed),
+        })
+
+    def recordSummary(self):
+        # With --json, the last record: the totals for the whole comparison
+        if not settings.LOG_JSON:
+            return
+        logRecord({
+            'type': 'summary',
+            '1st': self.A.filepath,
+            '2nd': self.B.filepath,
+            'counts': self.COUNT,
+        })
+
+    def countCommon(self, pairs):
+        # Counts the pairs in common all at once, as columns, if NumPy is installed.
+        # Gives back the pairs that still need to be checked one at a time: with --info,
+        # every pair that isn't a perfect match, since those are printed.
+        if settings.LOG_JSON or len(pairs) < COMPARE_VECTORISE_MINIMUM:
+            # Every pair gets a record of its own anyway
+            return pairs
+        numpy = importNumpy()
+        if numpy is None:
+            return pairs
+
+        hashesA = list( map( operator.itemgetter(0), pairs ) )
+        hashesB = list( map( operator.itemgetter(1), pairs ) )
+
+        def column(hashes, attribute, dtype=object):
+            values = list( map( operator.attrgetter(attribute), hashes ) )
+            try:
+                return numpy.array(values, dtype=dtype)
+            except (TypeError, OverflowError):
+                # e.g. sizes of None in a plain list of checksums, compare them as they are
+                return numpy.array(values, dtype=object)
+
+        try:
+            sameFilename = column(hashesA, 'filename') == column(hashesB, 'filename')
+            # (Directories are interned, so most of these are the same string object and compare at once)
+            sameDirectory = column(hashesA, 'directory') == column(hashesB, 'directory')
+            sameSize = column(hashesA, 'size', numpy.uint64) == column(hashesB, 'size', numpy.uint64)
+            sizeDefined = column(hashesA, 'sizeDefined', bool) & column(hashesB, 'sizeDefined', bool)
+        except AttributeError:
+            # An entry without a filename or size, leave them all to be checked one at a time
+            return pairs
+
+        perfect = sameFilename & sameDirectory & sameSize
+        self.COUNT['PERFECT'] += int( perfect.sum() )
+        if settings.LOG_VERBOSE:
+            return [ pairs[i] for i in numpy.flatnonzero(~perfect) ]
+
+        # The same decisions as the checks one at a time below, for all of the other pairs at once.
+        # Every pair has every attribute here, so dates never change the outcome.
+        minor = ~perfect & ~( sameFilename & sameDirectory )
+        sizeChanged = ~perfect & ~sameSize
+        self.COUNT['MINOR'] += int( minor.sum() )
+        # A size that isn't specified can't be compared, which is as good as a match
+        self.COUNT['PERFECT'] += int( ( sizeChanged & ~sizeDefined ).sum() )
+        self.COUNT['IMPOSSIBLE'] += int( ( sizeChanged & sizeDefined & ~minor ).sum() )
+        return []
+
+    def findMovedFolders(self):
+        # Folders that were renamed or moved as a whole, so they can be reported once
+        # rather than as a different path on every file in them.
+        # A folder only counts if every file in common under it went to the same place.
+        filesPerDirectory = {}
+        moves = {}
+        candidates = {}
+        for hashA, hashB in self.common:
+            directoryA = getattr(hashA, 'directory', None)
+            directoryB = getattr(hashB, 'directory', None)
+            if directoryA is None or directoryB is None:
+                continue
+            filesPerDirectory[directoryA] = filesPerDirectory.get(directoryA, 0) + 1
+            if directoryA != directoryB:
+                # Files in the same folder all move the same way, so only work each one out once
+                move = moves.get( ( directoryA, directoryB ) )
+                if move is None:
+                    move = moves[ ( directoryA, directoryB ) ] = folderMove(directoryA, directoryB)
+                candidates.setdefault(move, []).append( ( hashA, hashB ) )
+
+        # How many files in common are under each folder, at any depth: counted once for every folder
+        # above each directory, so that checking a folder is one lookup however many there are
+        filesPerFolder = {}
+        for directory, count in filesPerDirectory.items():
+            filesPerFolder['/'] = filesPerFolder.get('/', 0) + count
+            if directory == '/':
+                continue
+            folder = directory
+            while True:
+                filesPerFolder[folder] = filesPerFolder.get(folder, 0) + count
+                parent = folder.rpartition('/')[0]
+                if not parent:
+                    break
+                folder = parent
+
+        def isWhole(folderA, pairs):
+            if len(pairs) < COMPARE_FOLDER_MOVE_MINIMUM:
+                return False
+            return filesPerFolder.get(folderA, 0) == len(pairs)
+
+        movedFolders = {}
+        for ( folderA, folderB ), pairs in candidates.items():
+            if isWhole(folderA, pairs):
+                movedFolders[ ( folderA, folderB ) ] = pairs
+            elif '/' in ( folderA, folderB ):
+                # Not everything was moved into (or out of) a folder, but maybe some of the folders were
+                movesInside = {}
+                inside = {}
+                for hashA, hashB in pairs:
+                    move = movesInside.get( ( hashA.directory, hashB.directory ) )
+                    if move is None:
+                        move = movesInside[ ( hashA.directory, hashB.directory ) ] = folderMove(hashA.directory, hashB.directory, inside=True)
+                    inside.setdefault(move, []).append( ( hashA, hashB ) )
+                for ( folderA, folderB ), pairs in inside.items():
+                    if isWhole(folderA, pairs):
+                        movedFolders[ ( folderA, folderB ) ] = pairs
+        return movedFolders
+
+    def checkCommon(self, pairs=None):
+        # Checks every pair in common, or just these ones (e.g. the new ones, when following an MHL being written).
+        # Files whose only difference is a path that is explained by their folder moving
+        movedFiles = set()
+        if pairs is None:
+            pairs = self.common
+            # Folders can only be judged as a whole
+            self.movedFolders = self.findMovedFolders()
+            for ( folderA, folderB ), moved in sorted( self.movedFolders.items() ):
+                movedFiles.update( id(hashA) for hashA, hashB in moved )
+                logDetail( '  ' + color( 'Folder renamed or moved', None, attrs=LOG_COLOR_BOLD ) )
+                logDetail( '      Path (1st):', color( folderA, LOG_COLOR_MHL_A ) )
+                logDetail( '           (2nd):', color( folderB, LOG_COLOR_MHL_B ) )
+                logDetail( '      {} files moved with it, only the ones with other differences are listed below.'.format( len(moved) ) )
+                logRecord({
+                    'type': 'folder',
+                    '1st': folderA,
+                    '2nd': folderB,
+                    'files': len(moved),
+                })
+
+        for hashA, hashB in self.countCommon(pairs):
+            counted = None
+
+            differences = hashA.compare( hashB, dates=settings.LOG_SHOW_DATES, dateTolerance=self.dateTolerance )
+            dChanged, dAdded, dRemoved = differences
+
+            if id(hashA) in movedFiles and not ( ( dChanged | dAdded | dRemoved ) & ~( FIELD_DIRECTORY | FIELD_HASHES ) ):
+                # Already reported along with its folder
+                self.COUNT['MINOR'] += 1
+                self.recordFile('MINOR', hashA, hashB, differences)
+                continue
+
+            if not ( dChanged | dAdded | dRemoved ) & ( FIELD_FILENAME | FIELD_DIRECTORY | FIELD_SIZE ):
+                # If neither of these variables have changed, then we have a perfect match.
+                # Report it and move on.
+                if not counted:
+                    self.COUNT['PERFECT'] += 1
+                    counted = 'PERFECT'
+                self.recordFile(counted, hashA, hashB, differences)
+                continue
+
+            if dChanged & FIELD_FILENAME:
+                if not counted:
+                    self.COUNT['MINOR'] += 1
+                    counted = 'MINOR'
+                logDetail( '  ' + color( hashA.filename, 'green', attrs=LOG_COLOR_BOLD ) )
+                logDetail( '      Filename: different (1st):', color( hashA.filename, LOG_COLOR_MHL_A ) )
+                logDetail( '                          (2nd):', color( hashB.filename, LOG_COLOR_MHL_B ) )
+            else:
+                logDetail( '  ' + color( hashA.filename, None, attrs=LOG_COLOR_BOLD ) )
+            if dChanged & FIELD_DIRECTORY:
+                if not counted:
+                    self.COUNT['MINOR'] += 1
+                    counted = 'MINOR'
+                logDetail( '      Path: different (1st):', color( hashA.directory, LOG_COLOR_MHL_A ) )
+                logDetail( '                      (2nd):', color( hashB.directory, LOG_COLOR_MHL_B ) )
+            else:
+                logDetail( '      Path: identical: ' + hashA.directory )
+
+            # Straight up print the hash, don't check it.
+            # At this stage, it's not possible for the hash to be different.
+            # A check has already been performed for the pair to even be included in this group.
+            logDetail( '      Hash: identical: {} ({})'.format( showDigest(hashA.identifier), hashA.identifierType ) )
+
+            if dChanged & FIELD_SIZE:
+                # First, check if the Size is simply "Not specified"
+                if hashA.sizeDefined == False or hashB.sizeDefined == False:
+                    self.COUNT['PERFECT'] += 1
+                    counted = counted or 'PERFECT'
+
+                # It is an anomaly if the size has changed, but not the hash.
+                # Report it as impossible, but also print it to the user anyway.
+                if not counted:
+                    self.COUNT['IMPOSSIBLE'] += 1
+                    counted = 'IMPOSSIBLE'
+                logDetail( '      Size: different (1st):', color( hashA.sizeHuman, LOG_COLOR_MHL_A ) )
+                logDetail( '                      (2nd):', color( hashB.sizeHuman, LOG_COLOR_MHL_B ) )
+            else:
+                logDetail( '      ' + 'Size: identical: ' + hashA.sizeHuman )
+
+            if dChanged & FIELD_LASTMODIFICATIONDATE:
+                if settings.LOG_SHOW_DATES:
+                    if not counted:
+                        self.COUNT['MINOR'] += 1
+                        counted = 'MINOR'
+                    logDetail(
+                        '      Modified date: different (1st):',
+                        color( hashA.lastmodificationdate, LOG_COLOR_MHL_A )
+                     )
+                    logDetail(
+                        '                               (2nd):',
+                        color( hashB.lastmodificationdate, LOG_COLOR_MHL_B )
+                    )
+                else:
+                    # Don't count date changes unless user wants it (settings.LOG_SHOW_DATES is true)
+                    pass
+
+            # Briefly explain to the user what attributes were added/removed
+            # (Dates are only compared when the user wants them, and hash types one of them lacks are only in --json)
+            if dAdded & ~FIELD_HASHES:
+                dAddedString = ', '.join( fieldNames(dAdded & ~FIELD_HASHES) )
+                logDetail(
+                    '      These attributes exist in 1st only:',
+                    color(dAddedString, LOG_COLOR_MHL_A )
+                )
+            if dRemoved & ~FIELD_HASHES:
+                dRemovedString = ', '.join( fieldNames(dRemoved & ~FIELD_HASHES) )
+                logDetail(
+                    '      These attributes exist in 2nd only:',
+                    color(dRemovedString, LOG_COLOR_MHL_B )
+                )
+
+            self.recordFile(counted, hashA, hashB, differences)
+
+    def checkDelta(self, letter, delta=None):
+        # Checks every file only in one MHL, or just these ones
+        if letter == 'A':
+            if delta is None:
+                delta = self.deltaA
+            # Refer to the opposite MHL to access and perform searches on it
+            oppositeMHL = self.B
+
+            listLetter = 'A'
+            listLabel = '1st'
+            listLabelOpposite = '2nd'
+            listColor = LOG_COLOR_MHL_A
+            listColorOpposite = LOG_COLOR_MHL_B
+        elif letter == 'B':
+            if delta is None:
+                delta = self.deltaB
+            oppositeMHL = self.A
+
+            listLetter = 'B'
+            listLabel = '2nd'
+            listLabelOpposite = '1st'
+            listColor = LOG_COLOR_MHL_B
+            listColorOpposite = LOG_COLOR_MHL_A
+        else:
+            raise Exception("INTERNAL: Couldn't check deltas, none were specified. Specify one")
+            return
+
+        # Quickly clean Nonexistent objects out if they exist
+        deltaClean = [ h for h in delta if not isinstance(h, HashNonexistent) ]
+        deltaClean.sort()
+
+        for hash in deltaClean:
+
+            # Debug
+            # print(color('DEBUG >>>', 'yellow'), hash.identifier, color(hash.filename, 'green'))
+            # print('rh', hash.recordedHashes)
+
+            foundHashPossible = None
+            counted = None  # If this hash has been counted yet
+
+            # Look for a match by other hash
+            # E.g., if XXHASH and MD5 present, search by MD5
+            for otherHashType, otherHashValue in hash.recordedHashes.items():
+                if otherHashType == hash.identifierType:
+                    pass  # Skip the hash type we are already using
+
+                hashPossible = oppositeMHL.findByOtherHash( otherHashType, otherHashValue )
+                if isinstance(hashPossible, HashNonexistent):
+                    # No result found, move on
+                    foundHashPossible = False
+                    pass
+                else:
+                    # Found it
+                    # And because we found it by another hash...
+                    # Let's update the IDENTIFIER. Risky?
+                    hash.identifier = otherHashValue
+                    hash.identifierType = otherHashType
+                    hashPossible.identifier = otherHashValue
+                    hashPossible.identifierType = otherHashType
+                    foundHashPossible = True
+                    break
+
+            if foundHashPossible is False:
+                # Searched but no matches by other hash.
+                # Look for a match by size and filename, then by size and filename without its extension,
+                # then by filename alone. (Without a size, only the last means anything.)
+                hashPossible = HashNonexistent()
+                if getattr(hash, 'sizeDefined', False):
+                    hashPossible = oppositeMHL.findHashByAttribute( ( 'size', 'filename' ), ( hash.size, hash.filename ) )
+                    if isinstance(hashPossible, HashNonexistent):
+                        hashPossible = oppositeMHL.findHashByAttribute( ( 'size', 'stem' ), ( hash.size, hash.stem ) )
+                if isinstance(hashPossible, HashNonexistent):
+                    hashPossible = oppositeMHL.findHashByAttribute( 'filename', hash.filename )
+
+                if isinstance(hashPossible, HashNonexistent):
+                    # Definitely missing. No other matches by name or hash.
+                    foundHashPossible = False
+                else:
+                    foundHashPossible = True
+
+            if foundHashPossible is True:
+                # Compare the hash and the possible hash.
+                differences = hash.compare( hashPossible, dates=settings.LOG_SHOW_DATES )
+                dChanged, dAdded, dRemoved = differences
+
+                # First print a filename so everything fits underneath it.
+                logDetail( '  ' + color( hash.filename, None, attrs=LOG_COLOR_BOLD ) )
+
+                # Then begin testing.
+                if hash.identifierType == hashPossible.identifierType:
+                    # Hash type is the same
+                    if hash.identifier == hashPossible.identifier:
+                        # And so are the hashes
+
+                        # But check if it's a duplicate first
+                        if hash.isDuplicate is True:
+                            logDetail('      This file is a duplicate. Another file exists in this MHL with the same hash.')
+                            if not counted:
+                                self.COUNT['DUPLICATE'] += 1
+                                counted = 'DUPLICATE'
+                            logDetail(
+                                '      Hash ({}):'.format(listLabel),
+                                color(showDigest(hash.identifier) + ' ({})'.format(hash.identifierType), listColor)
+                            )
+                        else:
+                            if not counted:
+                                self.COUNT['PERFECT'] += 1
+                                counted = 'PERFECT'
+                            logDetail('      Hash: identical.')
+                    else:
+                        # But the hashes are different. File has changed?
+                        if not counted:
+                            self.COUNT['HASH_CHANGED'] += 1
+                            counted = 'HASH_CHANGED'
+                        logDetail( color('      Hash: These hashes are different from each other. It is likely the files were different between the time the MHLs were generated.', LOG_COLOR_WARNING ) )
+                else:
+                    # Hash type is not the same. Unlikely to be comparable.
+                    if not counted:
+                        self.COUNT['HASH_TYPE_DIFFERENT'] += 1
+                        counted = 'HASH_TYPE_DIFFERENT'
+                    logDetail(color("      Hash: These hashes are of different types. It's not possible to compare them.", LOG_COLOR_INFORMATION))
+
+                if hash.isDuplicate is False:
+                    logDetail(
+                        '      Hash ({}):'.format(listLabel),
+                        color(
+                            '{} ({})'.format(showDigest(hash.identifier), hash.identifierType), listColor
+                        )
+                    )
+                    logDetail(
+                        '      Hash ({}):'.format(listLabelOpposite),
+                        color(
+                            '{} ({})'.format(showDigest(hashPossible.identifier), hashPossible.identifierType),
+                            listColorOpposite
+                        )
+                    )
+
+                if not ( dChanged | dAdded | dRemoved ) & ( FIELD_FILENAME | FIELD_DIRECTORY | FIELD_SIZE ):
+                    # If neither of these variables have changed, then we have a perfect match.
+                    # EVEN THOUGH we used a slightly different preferred hash.
+                    if not counted:
+                        self.COUNT['PERFECT'] += 1
+                        counted = 'PERFECT'
+                    self.recordFile(counted, hash, hashPossible, differences, letter=letter)
+                    continue
+                else:
+
+                    if dChanged & FIELD_FILENAME:
+                        if not counted:
+                            self.COUNT['MINOR'] += 1
+                            counted = 'MINOR'
+                        logDetail( '      Filename: different (1st):', color( hash.filename, LOG_COLOR_MHL_A ) )
+                        logDetail( '                          (2nd):', color( hashPossible.filename, LOG_COLOR_MHL_B ) )
+                    else:
+                        # If the filename is the same, it has already been declared closer to the top.
+                        pass
+
+                    if dChanged & FIELD_DIRECTORY:
+                        if not counted:
+                            self.COUNT['MINOR'] += 1
+                            counted = 'MINOR'
+                        logDetail( '      Path: different (1st):', color( hash.directory, LOG_COLOR_MHL_A ) )
+                        logDetail( '                      (2nd):', color( hashPossible.directory, LOG_COLOR_MHL_B ) )
+                    else:
+                        logDetail( '      Path: identical:', hash.directory )
+
+                    if dChanged & FIELD_SIZE:
+                        # First, check if the Size is simply "Not specified"
+                        # This is not an anomaly if so.
+                        if hash.sizeDefined == False:
+                            # If we have come this far (hash match, name, directory) but size can't be compared
+                            # That is as good as we are gonna get.
+                            self.COUNT['PERFECT'] += 1
+                            counted = counted or 'PERFECT'
+                        else:
+                            # It is an anomaly if the size has changed while the hash has not.
+                            # Report it as impossible, but also print it to the user anyway.
+                            if not counted:
+                                self.COUNT['IMPOSSIBLE'] += 1
+                                counted = 'IMPOSSIBLE'
+                            logDetail( '      Size: different (1st):', color( hash.sizeHuman, LOG_COLOR_MHL_A ) )
+                            logDetail( '                      (2nd):', color( hashPossible.sizeHuman, LOG_COLOR_MHL_B ) )
+                    else:
+                        logDetail( '      ' + 'Size: identical: ' + hashPossible.sizeHuman )
+
+                    if dChanged & FIELD_LASTMODIFICATIONDATE:
+                        if settings.LOG_SHOW_DATES:
+                            if not counted:
+                                self.COUNT['MINOR'] += 1
+                                counted = 'MINOR'
+
+                            hModDate = showDate(hash.lastmodificationdate)
+                            hPModDate = showDate(hashPossible.lastmodificationdate)
+
+                            logDetail( '      Modified date: different (1st):', color( hModDate, LOG_COLOR_MHL_A ) )
+                            logDetail( '                               (2nd):', color( hPModDate, LOG_COLOR_MHL_B ) )
+                        else:
+                            # Don't count date changes unless user wants it (settings.LOG_SHOW_DATES is true)
+                            pass
+
+                    # Briefly explain to the user what attributes were added/removed
+                    # (Dates are only compared when the user wants them, and hash types one of them lacks are only in --json)
+                    if dAdded & ~FIELD_HASHES:
+                        dAddedString = ', '.join( fieldNames(dAdded & ~FIELD_HASHES) )
+                        logDetail(
+                            '      These attributes exist in 1st only:',
+                            color(dAddedString, LOG_COLOR_MHL_A )
+                        )
+                    if dRemoved & ~FIELD_HASHES:
+                        dRemovedString = ', '.join( fieldNames(dRemoved & ~FIELD_HASHES) )
+                        logDetail(
+                            '      These attributes exist in 2nd only:',
+                            color(dRemovedString, LOG_COLOR_MHL_B )
+                        )
+
+                self.recordFile(counted, hash, hashPossible, differences, letter=letter)
+
+            else:
+                # Else if foundHashPossible was False.
+                self.COUNT['MISSING'] += 1
+                self.recordFile('MISSING', hash, None, letter=letter)
+                logDetail('  ' + color(hash.filename, listColor, attrs=LOG_COLOR_BOLD))
+                logDetail(
+                    '  This file only exists in',
+                    color(listLabel + ' MHL', listColor) + '.'
+                )
+                logDetail( '      ' + 'Path:', hash.directory )
+                logDetail( '      ' + 'Size:', hash.sizeHuman )
+                logDetail( '      ' + 'Hash:', showDigest(hash.identifier), '({})'.format(hash.identifierType ) )
+
+    def printInfo(self):
+        count_files_A = str( self.A.count() ) + " files"
+        count_files_B = str( self.B.count() ) + " files"
+
+
+        if self.A.originType == 'HASHLIST_PLAIN':
+            displayed_size_A = 'Size not specified (file is a simple list of checksums)'
+        else:
+            displayed_size_A = humanSize(self.A.totalSize(), showBytes=True)
+        if self.B.originType == 'HASHLIST_PLAIN':
+            displayed_size_B = 'Size not specified (file is a simple list of checksums)'
+        else:
+            displayed_size_B = humanSize(self.B.totalSize(), showBytes=True)
+
+        print('')
+        if settings.LOG_VERBOSE:
+            print('Summary:')
+        print('1st MHL file:', color(self.A.filepath, LOG_COLOR_MHL_A) )
+        print('             ', color(count_files_A, LOG_COLOR_MHL_A) )
+        print('             ', color(displayed_size_A, LOG_COLOR_MHL_A) )
+        print('2nd MHL file:', color(self.B.filepath, LOG_COLOR_MHL_B) )
+        print('             ', color(count_files_B, LOG_COLOR_MHL_B) )
+        print('             ', color(displayed_size_B, LOG_COLOR_MHL_B) )
+        return
+
+    def describeOutcomes(self):
+        outcomes = {
+            'PERFECT': {
+                'desc': 'matched perfectly'
+                },
+            'MINOR': {
+                'desc': 'matched (but with differences in name or directory)'
+                },
+            'HASH_TYPE_DIFFERENT': {
+                'desc': 'had incomparable hash types and could not be compared',
+                'color': LOG_COLOR_INFORMATION
+                },
+            'HASH_CHANGED': {
+                'desc': 'had different hashes. The files were likely different at the time the MHLs were generated',
+                'desc_singular': 'had different hashes. The file was likely different at the time the MHLs were generated',
+                'color': LOG_COLOR_WARNING
+                },
+            'MISSING': {
+                'desc': 'were present only in one MHL or the other',
+                'desc_singular': 'was present only in one MHL or the other'
+                },
+            'IMPOSSIBLE': {
+                'desc': 'anomaly -- MHL was likely modified or something unusual happened'
+                },
+            'DUPLICATE': {
+                'desc': 'were duplicates, as they had the same hash as other files',
+                'desc_singular': 'was a duplicate, as it had the same hash as another file'
+                },
+            'NO_FILES_IN_COMMON': {
+                'desc': 'There were no files in common between these two MHLs.'
+                }
+            }
+        return outcomes
+
+    def printCount(self):
+        outcomes = self.describeOutcomes()
+        for label in outcomes.values():
+            # If a singular description ('was' vs. 'were') is not defined, just use the regular description.
+            if 'desc_singular' not in label.keys():
+                label['desc_singular'] = label['desc']
+            # If a color is not defined, don't use any.
+            if 'color' not in label.keys():
+                label['color'] = None
+
+        print('')
+        print('Observations:')
+
+        # Quick check to see if both MHLs are completely and utterly different
+        # If all counts are zero, except missing, then there really was nothing in common.
+        sumCountsGenuine = sum( self.COUNT.values() ) - sum( self.COUNT[category] for category in self.UNMATCHED )
+        if not sumCountsGenuine > 0:
+            print('    ' + color('There were NO files in common between these two MHL files.', LOG_COLOR_INFORMATION) )
+        for category, count in self.COUNT.items():
+            line_color = outcomes[category]['color']
+            if count == 0:
+                # Don't mention empty categories, not relevant
+                continue
+            elif count == 1:
+                count_words = str(count) + " file"
+                label_type = 'desc_singular'
+            else:
+                count_words = str(count) + " files"
+                label_type = 'desc'
+
+            print( color(
+                "    " + count_words + " " + outcomes[category][label_type],
+                line_color)
+            )
+        movedFolders = sorted( self.movedFolders.items() )
+        for ( folderA, folderB ), pairs in movedFolders[:COMPARE_FOLDER_MOVE_SUMMARY]:
+            print( '    {} files were in a folder that was renamed or moved:'.format( len(pairs) ) )
+            print( '        1st:', color( folderA, LOG_COLOR_MHL_A ) )
+            print( '        2nd:', color( folderB, LOG_COLOR_MHL_B ) )
+        if len(movedFolders) > COMPARE_FOLDER_MOVE_SUMMARY:
+            others = movedFolders[COMPARE_FOLDER_MOVE_SUMMARY:]
+            print( '    {} files were in {} other folders that were renamed or moved{}.'.format(
+                sum( len(pairs) for folders, pairs in others ),
+                len(others),
+                '' if settings.LOG_VERBOSE else ', see them with --info'
+            ) )
+        if not settings.LOG_VERBOSE:
+            print('')
+            print('    Run the check again with --info to view details.')
+
+        # print( self.COUNT )
+        return
+
+
+class MultiComparison(Comparison):
+    # Compares three or more MHLs of the same media in one go.
+    # Each MHL is loaded once and all of their entries go into one shared index,
+    # so the work grows with the total number of entries rather than with the number of pairs.
+    def __init__(self, mhls):
+        self.mhls = mhls
+        self.labels = [ ordinal(i + 1) for i in range(len(mhls)) ]
+        self.colors = [ LOG_COLORS_MHL[i % len(LOG_COLORS_MHL)] for i in range(len(mhls)) ]
+
+        # For every hash, the entry listed under it in each MHL (None if that MHL doesn't list it).
+        # Duplicates within an MHL get a key of their own, and are lined up in the order they appear.
+        self.index = {}
+        for i, mhl in enumerate(self.mhls):
+            duplicatesSeen = {}
+            for hash in mhl.hashes.values():
+                key = hash.originalIdentifier
+                if hash.isDuplicate:
+                    duplicatesSeen[key] = duplicatesSeen.get(key, 0) + 1
+                    key = ( key, duplicatesSeen[key] )
+                copies = self.index.get(key)
+                if copies is None:
+                    copies = self.index[key] = [ None ] * len(self.mhls)
+                copies[i] = hash
+
+        # Per MHL, how many files it was missing, or listed differently to the others
+        self.countMissing = [ 0 ] * len(self.mhls)
+        self.countDifferent = [ 0 ] * len(self.mhls)
+
+        self.createCount()
+
+    def findCounterpart(self, mhl, hash, accounted):
+        # For an MHL that doesn't list this hash, look for the same file in it some other way.
+        # Returns the entry found (or None), and whether its hash agrees.
+        for otherHashType, otherHashValue in hash.recordedHashes.items():
+            hashPossible = mhl.findByOtherHash( otherHashType, otherHashValue )
+            if not isinstance(hashPossible, HashNonexistent) and id(hashPossible) not in accounted:
+                return hashPossible, True
+        hashPossible = mhl.findHashByAttribute( 'filename', hash.filename )
+        if not isinstance(hashPossible, HashNonexistent) and id(hashPossible) not in accounted:
+            return hashPossible, False
+        return None, False
+
+    def checkAll(self):
+        # Every entry is reported once: either under its own hash,
+        # or as the counterpart of a file reported before it.
+        accounted = set()
+
+        for key, copies in self.index.items():
+            copies = [ h if h is not None and id(h) not in accounted else None for h in copies ]
+            present = [ h for h in copies if h is not None ]
+            if not present:
+                continue
+            reference = present[0]
+
+            # What each MHL says about this file: None if missing, otherwise a list of differences
+            differences = [ None ] * len(copies)
+            for i, hash in enumerate(copies):
+                if hash is None:
+                    hash, hashAgrees = self.findCounterpart( self.mhls[i], reference, accounted )
+                    if hash is None:
+                        continue
+                    copies[i] = hash
+                    if not hashAgrees:
+                        if hash.identifierType == reference.identifierType:
+                            differences[i] = [ 'hash' ]
+                        else:
+                            differences[i] = [ 'hash type' ]
+                        continue
+                differences[i] = self.compareAttributes( reference, hash )
+
+            for hash in copies:
+                if hash is not None:
+                    accounted.add( id(hash) )
+
+            # Decide on a single outcome for the file, the most serious one wins
+            found = [ d for d in differences if d is not None ]
+            allDifferences = { name for d in found for name in d }
+            if 'hash' in allDifferences:
+                category = 'HASH_CHANGED'
+            elif 'hash type' in allDifferences:
+                category = 'HASH_TYPE_DIFFERENT'
+            elif 'size' in allDifferences:
+                category = 'IMPOSSIBLE'
+            elif len(found) < len(copies):
+                if isinstance(key, tuple):
+                    # The hash is there, this MHL just lists it fewer times
+                    category = 'DUPLICATE'
+                else:
+                    category = 'MISSING'
+            elif allDifferences:
+                category = 'MINOR'
+            else:
+                category = 'PERFECT'
+            self.COUNT[category] += 1
+
+            for i, d in enumerate(differences):
+                if d is None:
+                    self.countMissing[i] += 1
+                elif d:
+                    self.countDifferent[i] += 1
+
+            if category != 'PERFECT':
+                self.logFile( reference, copies, differences )
+
+    def compareAttributes(self, reference, hash):
+        changed, onlyThis, onlyOther = hash.compare( reference, dates=settings.LOG_SHOW_DATES )
+        relevant = FIELD_FILENAME | FIELD_DIRECTORY
+        if hash.sizeDefined and reference.sizeDefined:
+            relevant |= FIELD_SIZE
+        differences = fieldNames( changed & relevant )
+        if ( changed | onlyThis | onlyOther ) & FIELD_LASTMODIFICATIONDATE:
+            # Including where only one of them has a date
+            differences.append('lastmodificationdate')
+        return differences
+
+    def logFile(self, reference, copies, differences):
+        logDetail( '  ' + color( reference.filename, None, attrs=LOG_COLOR_BOLD ) )
+        logDetail( '      Hash: {} ({})'.format( showDigest(reference.originalIdentifier), reference.identifierType ) )
+        for i, hash in enumerate(copies):
+            label = '      ' + color( '({}):'.format(self.labels[i]), self.colors[i] )
+            if hash is None:
+                logDetail( label, color('missing', LOG_COLOR_WARNING) )
+                continue
+            line = '{}, {}'.format( hash.filepath, hash.sizeHuman )
+            if differences[i]:
+                if 'hash' in differences[i] or 'hash type' in differences[i]:
+                    line += ', hash: {} ({})'.format( showDigest(hash.originalIdentifier), hash.identifierType )
+                line += ' -- different ' + ', '.join( differences[i] )
+            logDetail( label, color( line, self.colors[i] ) )
+
+    def printInfo(self):
+        print('')
+        if settings.LOG_VERBOSE:
+            print('Summary:')
+        for i, mhl in enumerate(self.mhls):
+            if mhl.originType == 'HASHLIST_PLAIN':
+                displayed_size = 'Size not specified (file is a simple list of checksums)'
+            else:
+                displayed_size = humanSize(mhl.totalSize(), showBytes=True)
+            print('{} MHL file:'.format(self.labels[i]), color(mhl.filepath, self.colors[i]) )
+            print('             ', color(str( mhl.count() ) + " files", self.colors[i]) )
+            print('             ', color(displayed_size, self.colors[i]) )
+        return
+
+    def describeOutcomes(self):
+        outcomes = super().describeOutcomes()
+        outcomes['MISSING'] = {
+            'desc': 'were missing from one or more of the MHLs',
+            'desc_singular': 'was missing from one or more of the MHLs'
+            }
+        outcomes['DUPLICATE']['desc'] = 'were duplicates, listed more times in some MHLs than in others'
+        outcomes['DUPLICATE']['desc_singular'] = 'was a duplicate, listed more times in some MHLs than in others'
+        return outcomes
+
+    def printCount(self):
+        print('')
+        print('Per MHL:')
+        for i, mhl in enumerate(self.mhls):
+            print( '    ' + color( '{} MHL:'.format(self.labels[i]), self.colors[i] ),
+                '{} missing, {} listed differently'.format( self.countMissing[i], self.countDifferent[i] ) )
+        super().printCount()
+        return
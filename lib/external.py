@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Comparing two MHLs too big to hold in memory, by sorting them on disk first.
+
+import io
+import os
+import heapq
+import pickle
+import operator
+import itertools
+
+from .settings import HASHLIST_SNIFF_SIZE, EXTERNAL_ENTRY_SIZE, EXTERNAL_BLOCK_SIZE, EXTERNAL_BATCH_SIZE
+from .mhl import MHL, EmptyHashlist, Hash, attributeKey, openHashlist, iterHashlist, iterPlainHashlist, sniffHashlistFormat
+from .compare import Comparison
+
+
+# Where the hash that files are paired on is, in a Hash.record()
+RECORD_IDENTIFIER = Hash.RECORD_SLOTS.index('originalIdentifier') + 1
+# What checkDelta() looks files up by, other than their hashes
+CANDIDATE_ATTRIBUTES = ( ( 'size', 'filename' ), ( 'size', 'stem' ), 'filename' )
+
+
+def recordKey(record):
+    # What entries are sorted on. Hashes are ints, bytes or (from a damaged MHL) text, which
+    # can't be sorted against each other, so each kind is sorted on its own. Only the same kind can be equal.
+    digest = record[RECORD_IDENTIFIER]
+    if isinstance(digest, int):
+        return ( 0, digest )
+    if isinstance(digest, bytes):
+        return ( 1, digest )
+    return ( 2, digest )
+
+
+def iterEntries(filepath):
+    # The entries of an MHL or plain list of checksums, one at a time, as MHL() would read them.
+    # Gives back ( originType, entry ).
+    with openHashlist(filepath) as f:
+        originType = sniffHashlistFormat( f.read(HASHLIST_SNIFF_SIZE) )
+        f.seek(0)
+        if originType == 'MHL':
+            from xml.etree import ElementTree
+            try:
+                for tag, value in iterHashlist(f):
+                    if tag == 'hash':
+                        yield originType, value
+            except ElementTree.ParseError as error:
+                raise Exception("\n\n    Could not read this MHL, the XML is malformed ({}).".format(error) + "\n    " + filepath)
+        elif originType == 'HASHLIST_PLAIN':
+            for value in iterPlainHashlist( io.TextIOWrapper(f, encoding='utf-8', errors='replace') ):
+                yield originType, value
+        else:
+            raise Exception("\n\n    Unrecognised file: not an MHL nor a simple list of checksums." + "\n    " + filepath)
+
+
+class BlockWriter:
+    # Writes records to a file a block at a time, so reading back many of these files at once
+    # only ever needs a block of each in memory
+    def __init__(self, f):
+        self.f = f
+        self.block = []
+
+    def add(self, record):
+        self.block.append(record)
+        if len(self.block) >= EXTERNAL_BLOCK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.block:
+            pickle.dump(self.block, self.f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.block = []
+
+
+def readBlocks(filepath):
+    with open(filepath, 'rb') as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+def joinGroups(groupsA, groupsB):
+    # Merge-joins two lists of ( key, entries ) that are both in order of their key.
+    # Gives back ( entries in A, entries in B ) for each key, one side empty when only the other has it.
+    groupsA = iter(groupsA)
+    groupsB = iter(groupsB)
+    groupA = next(groupsA, None)
+    groupB = next(groupsB, None)
+    while groupA is not None or groupB is not None:
+        if groupB is None or ( groupA is not None and groupA[0] < groupB[0] ):
+            yield list( groupA[1] ), []
+            groupA = next(groupsA, None)
+        elif groupA is None or groupB[0] < groupA[0]:
+            yield [], list( groupB[1] )
+            groupB = next(groupsB, None)
+        else:
+            yield list( groupA[1] ), list( groupB[1] )
+            groupA = next(groupsA, None)
+            groupB = next(groupsB, None)
+
+
+def sortableKey(value):
+    # Lookup keys mix ints, bytes and text, and False where an entry doesn't have the attribute,
+    # which can't be sorted against each other. Each part becomes ( kind, value ), so only the same kind
+    # is compared. False is 0, as it is when looked up in a dict.
+    if isinstance(value, tuple):
+        return tuple( sortableKey(part) for part in value )
+    if isinstance(value, int):
+        return ( 0, int(value) )
+    if isinstance(value, bytes):
+        return ( 1, value )
+    return ( 2, value )
+
+
+def lookupKeys(hash):
+    # Everything checkDelta() can find an entry by: each of its hashes, and each of CANDIDATE_ATTRIBUTES.
+    # Numbered by what they are, so that each is only ever sorted against its own kind.
+    keys = { ( 0, hashType, sortableKey(digest) ) for hashType, digest in hash.recordedHashes.items() }
+    for number, attribute in enumerate(CANDIDATE_ATTRIBUTES, 1):
+        keys.add( ( number, sortableKey( attributeKey(hash, attribute) ) ) )
+    return keys
+
+
+def joinFirst(wanted, offered):
+    # Merge-joins two lists of ( key, value ) that are both in order of their key.
+    # Gives back ( value in wanted, value of the first in offered with the same key ), for each of wanted
+    # whose key is in offered. Neither is held in memory, however many share a key.
+    offered = iter(offered)
+    current = next(offered, None)
+    for key, value in wanted:
+        while current is not None and current[0] < key:
+            current = next(offered, None)
+        if current is None:
+            return
+        if current[0] == key:
+            yield value, current[1]
+
+
+class SortedRuns:
+    # Records sorted on disk, however many there are: as many as fit in the budget are sorted
+    # and written to a temporary file at a time, and all of them are read back in order by merging those.
+    def __init__(self, directory, label, key, budget):
+        self.directory = directory
+        self.label = label
+        self.key = key
+        self.budget = budget
+        self.records = []
+        self.runs = []
+        self.runCount = 0
+
+    def add(self, record):
+        self.records.append(record)
+        if len(self.records) >= self.budget:
+            self.spill()
+
+    def spill(self):
+        if self.records:
+            # The sort is stable, so records with the same key stay in the order they were added
+            self.records.sort(key=self.key)
+            self.writeRun(self.records)
+            self.records = []
+
+    def writeRun(self, records):
+        path = os.path.join( self.directory, '{}-{}.run'.format( self.label, self.runCount ) )
+        self.runCount += 1
+        with open(path, 'wb') as f:
+            writer = BlockWriter(f)
+            for record in records:
+                writer.add(record)
+            writer.flush()
+        self.runs.append(path)
+
+    def mergeRuns(self, maxRuns):
+        # Merging needs a block of every run in memory at once. With more runs than fit,
+        # they are merged a few at a time into longer ones first, in order, until few enough are left.
+        self.spill()
+        while len(self.runs) > maxRuns:
+            runs = self.runs
+            self.runs = []
+            for i in range(0, len(runs), maxRuns):
+                group = runs[i:i + maxRuns]
+                self.writeRun( heapq.merge( *[ readBlocks(path) for path in group ], key=self.key ) )
+                for path in group:
+                    os.remove(path)
+
+    def merged(self, maxRuns):
+        # All of the records, in order of their key. The runs are merged in the order they were written,
+        # so records with the same key still come back in the order they were added.
+        # The runs are only read the once, and removed when done.
+        self.mergeRuns(maxRuns)
+        readers = [ readBlocks(path) for path in self.runs ]
+        try:
+            yield from heapq.merge( *readers, key=self.key )
+        finally:
+            for reader in readers:
+                reader.close()
+            for path in self.runs:
+                os.remove(path)
+            self.runs = []
+
+
+class SortedMHL:
+    # An MHL read into sorted runs on disk, rather than into memory. Read in one pass, a run at a time:
+    # each run is as many entries as fit in the budget, sorted by hash and written to a temporary file.
+    # The entries are also written as they are listed, for findCandidates() to read rather than the MHL again.
+    # Has what printInfo() needs to know about the MHL, without keeping any of its entries.
+    def __init__(self, filepath, directory, label, budget):
+        self.filepath = filepath
+        self.mhlIdentifier = filepath
+        self.creatorinfo = None
+        self.originType = None
+        self.directory = directory
+        self.label = label
+        self.entries = 0
+        self.size = 0
+        self.duplicateSuffix = 1
+
+        self.runs = SortedRuns(directory, label, recordKey, budget)
+        self.pathListed = os.path.join( directory, '{}.listed'.format(label) )
+        with open(self.pathListed, 'wb') as f:
+            listed = BlockWriter(f)
+            for originType, item in iterEntries(filepath):
+                self.originType = originType
+                hash = Hash(item, self.mhlIdentifier)
+                self.entries += 1
+                if getattr(hash, 'sizeDefined', False):
+                    self.size += hash.size
+                record = hash.record()
+                self.runs.add(record)
+                listed.add(record)
+            listed.flush()
+        self.runs.spill()
+
+        if not self.entries:
+            raise EmptyHashlist('There were no files found listed in this MHL file:\n    {}\nAlternatively, there was a formatting issue in the file.'.format(self.filepath))
+
+    def mergeRuns(self, maxRuns):
+        self.runs.mergeRuns(maxRuns)
+
+    def groups(self, maxRuns):
+        # All of the entries, grouped by hash in order of their hash. Within a group,
+        # the entries are still in the order they were listed.
+        return itertools.groupby( self.runs.merged(maxRuns), key=recordKey )
+
+    def toHashes(self, records):
+        # The entries listed with the same hash. Like MHL.addHash(), every one after the first is a duplicate.
+        hashes = []
+        for record in records:
+            hash = Hash.fromRecord(record, self.mhlIdentifier)
+            if hashes:
+                hash.isDuplicate = True
+                hash.identifier = ( hash.identifier, self.duplicateSuffix )
+                self.duplicateSuffix += 1
+            hashes.append(hash)
+        return hashes
+
+    def findCandidates(self, pathDelta, mhlIdentifier, budget, maxRuns):
+        # What checkDelta() could find in this MHL for the files from the other one that are in pathDelta:
+        # for each hash and name it looks them up by, the first entry listed with it, as MHL's lookup tables have.
+        # Joined on disk in one pass over each, rather than looking each file up:
+        #   1. What each file looks for, sorted by it.
+        #   2. What each entry of this MHL can be found by, sorted by it. Entries are read in the order
+        #      they are listed, so the first of each one sorted is the first one listed.
+        #   3. The two are merged, giving where in this MHL each file's candidates are listed,
+        #      sorted by that so they are picked out in one more pass over the entries as listed.
+        # Gives back ( number of the file in pathDelta, where the entry is listed, its record ), in order of the file.
+        label = '{}-candidates'.format(self.label)
+        wanted = SortedRuns(self.directory, label + '-wanted', operator.itemgetter(0), budget)
+        for number, record in enumerate( readBlocks(pathDelta) ):
+            for key in lookupKeys( Hash.fromRecord(record, mhlIdentifier) ):
+                wanted.add( ( key, number ) )
+        wanted.spill()
+        if not wanted.runs:
+            return
+
+        offered = SortedRuns(self.directory, label + '-offered', operator.itemgetter(0), budget)
+        for position, record in enumerate( readBlocks(self.pathListed) ):
+            for key in lookupKeys( Hash.fromRecord(record, self.mhlIdentifier) ):
+                offered.add( ( key, position ) )
+
+        found = SortedRuns(self.directory, label + '-found', operator.itemgetter(0), budget)
+        for number, position in joinFirst( wanted.merged(maxRuns), offered.merged(maxRuns) ):
+            found.add( ( position, number ) )
+
+        candidates = SortedRuns(self.directory, label, operator.itemgetter(0), budget)
+        found = found.merged(maxRuns)
+        current = next(found, None)
+        for position, record in enumerate( readBlocks(self.pathListed) ):
+            if current is None:
+                break
+            while current is not None and current[0] == position:
+                candidates.add( ( current[1], position, record ) )
+                current = next(found, None)
+        yield from candidates.merged(maxRuns)
+
+    def toMHL(self, records):
+        # These entries of this MHL as an MHL in memory, to be searched as the whole MHL would be.
+        # Given in the order they are listed, so that the first one with each hash or name is the one found.
+        mhl = MHL.__new__(MHL)
+        mhl.filepath = self.filepath
+        mhl.mhlIdentifier = self.mhlIdentifier
+        mhl.creatorinfo = None
+        mhl.originType = self.originType
+        mhl.clearHashes()
+        for record in records:
+            mhl.fileHash( Hash.fromRecord(record, self.mhlIdentifier) )
+        return mhl
+
+    def count(self):
+        return self.entries
+
+    def totalSize(self):
+        if self.originType == 'HASHLIST_PLAIN':
+            # Then there is no record of sizes
+            return None
+        return self.size
+
+
+class SortedComparison(Comparison):
+    # Compares two MHLs in about as much memory as the limit given, however big they are:
+    #   1. Each MHL is read into runs sorted by hash on disk (see SortedMHL).
+    #   2. The runs of both are merged, so the entries of both come out in order of their hash,
+    #      and are paired off as they go. Pairs are checked a batch at a time, by checkCommon().
+    #      Files only in one or the other are written to disk.
+    #   3. What checkDelta() could find for those in the other MHL is found by sorting and joining them
+    #      on disk too (see SortedMHL.findCandidates()), and they are checked a chunk at a time against it.
+    # It reports the same as Comparison, except that folders that were moved are not picked out,
+    # as that needs every pair at once. Their files are still counted, as files with a different path.
+    def __init__(self, filepathA, filepathB, directory, memoryLimit):
+        self.directory = directory
+        # Half of the memory for the entries being sorted, the other half for merging and checking them
+        self.budget = max( EXTERNAL_BLOCK_SIZE, memoryLimit // 2 // EXTERNAL_ENTRY_SIZE )
+        self.A = SortedMHL(filepathA, directory, 'A', self.budget)
+        self.B = SortedMHL(filepathB, directory, 'B', self.budget)
+        # Merging reads a block from every run of both at once, keep that to half the budget
+        self.maxRuns = max( 2, self.budget // ( 4 * EXTERNAL_BLOCK_SIZE ) )
+        self.A.mergeRuns(self.maxRuns)
+        self.B.mergeRuns(self.maxRuns)
+        # and the pairs checked at a time, two entries each, to the other half
+        self.batchSize = max( 1, min( EXTERNAL_BATCH_SIZE, self.budget // 4 ) )
+        self.common = []
+        self.deltaA = []
+        self.deltaB = []
+        self.createCount()
+
+    def checkAll(self):
+        pathDeltaA = os.path.join(self.directory, 'A.delta')
+        pathDeltaB = os.path.join(self.directory, 'B.delta')
+
+        with open(pathDeltaA, 'wb') as fileA, open(pathDeltaB, 'wb') as fileB:
+            deltaA = BlockWriter(fileA)
+            deltaB = BlockWriter(fileB)
+            pairs = []
+            for recordsA, recordsB in joinGroups( self.A.groups(self.maxRuns), self.B.groups(self.maxRuns) ):
+                hashesA = self.A.toHashes(recordsA)
+                hashesB = self.B.toHashes(recordsB)
+                # Duplicates are paired off in the order they are listed, as in Comparison()
+                pairs.extend( zip(hashesA, hashesB) )
+                for hash in hashesA[ len(hashesB): ]:
+                    deltaA.add( hash.record() )
+                for hash in hashesB[ len(hashesA): ]:
+                    deltaB.add( hash.record() )
+                if len(pairs) >= self.batchSize:
+                    self.checkCommon(pairs)
+                    pairs = []
+            self.checkCommon(pairs)
+            deltaA.flush()
+            deltaB.flush()
+
+        self.checkDeltas(pathDeltaA, pathDeltaB)
+
+    def checkDeltas(self, pathDeltaA, pathDeltaB):
+        # Each file can bring a few candidates with it, leave room for them
+        chunkSize = max( EXTERNAL_BLOCK_SIZE, self.budget // ( len(CANDIDATE_ATTRIBUTES) * 2 ) )
+        A, B = self.A, self.B
+        try:
+            for letter, path, mhl, mhlOpposite in ( ( 'A', pathDeltaA, A, B ), ( 'B', pathDeltaB, B, A ) ):
+                records = enumerate( readBlocks(path) )
+                candidates = mhlOpposite.findCandidates(path, mhl.mhlIdentifier, self.budget, self.maxRuns)
+                candidate = next(candidates, None)
+                while True:
+                    chunk = list( itertools.islice(records, chunkSize) )
+                    if not chunk:
+                        break
+                    # The candidates come in the same order as the files, those for this chunk are next
+                    last = chunk[-1][0]
+                    found = {}
+                    while candidate is not None and candidate[0] <= last:
+                        found[ candidate[1] ] = candidate[2]
+                        candidate = next(candidates, None)
+                    # checkDelta() searches the opposite MHL
+                    opposite = mhlOpposite.toMHL( record for position, record in sorted( found.items() ) )
+                    if letter == 'A':
+                        self.B = opposite
+                    else:
+                        self.A = opposite
+                    self.checkDelta(letter, [ Hash.fromRecord(record, mhl.mhlIdentifier) for number, record in chunk ])
+        finally:
+            self.A, self.B = A, B
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Comparing against an MHL that is still being written, e.g. during an offload.
+
+import os
+import sys
+import time
+import collections
+
+from . import settings
+from .settings import HASHLIST_SNIFF_SIZE, FOLLOW_READ_SIZE, LOG_COLOR_MHL_A, LOG_COLOR_MHL_B
+from .mhl import MHL, HashlistReader, sniffHashlistFormat
+from .compare import Comparison
+from .output import color, humanSize
+
+
+class FollowedMHL(MHL):
+    # An MHL, or plain list of checksums, that is still being written.
+    # It starts out empty, and each update() reads only what was added to the file since the last one.
+    # Entries are taken as soon as they are complete, anything cut short waits for the next update.
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.mhlIdentifier = filepath
+        self.creatorinfo = None
+        self.originType = None
+        self.clearHashes()
+
+        # How far into the file has been read
+        self.offset = 0
+        # Read but not used yet: the start of the file until it's clear what it is, or a line cut short
+        self.pending = b''
+        self.parser = None
+        self.reader = None
+        # Once the MHL has been written in full (plain lists of checksums have no end to tell by)
+        self.finished = False
+        # The entries from the current update
+        self.added = []
+
+    def addHash(self, item):
+        hash = super().addHash(item)
+        self.added.append(hash)
+        return hash
+
+    def update(self):
+        # Gives back the entries that were added to the file since the last update
+        self.added = []
+        with open(self.filepath, 'rb') as f:
+            if os.fstat( f.fileno() ).st_size < self.offset:
+                raise Exception("\n\n    This file got shorter while it was being followed, it must have been written again from the start." + "\n    " + self.filepath)
+            f.seek(self.offset)
+            while not self.finished:
+                data = f.read(FOLLOW_READ_SIZE)
+                if not data:
+                    break
+                self.offset += len(data)
+                self.feed(data)
+        return self.added
+
+    def feed(self, data):
+        if self.originType is None:
+            data = self.pending + data
+            self.originType = sniffHashlistFormat( data[:HASHLIST_SNIFF_SIZE] )
+            if self.originType is None:
+                if len(data) >= HASHLIST_SNIFF_SIZE:
+                    raise Exception("\n\n    Unrecognised file: not an MHL nor a simple list of checksums." + "\n    " + self.filepath)
+                # Not enough of it written yet to tell
+                self.pending = data
+                return
+            self.pending = b''
+            if self.originType == 'MHL':
+                from xml.etree import ElementTree
+                self.parser = ElementTree.XMLPullParser(events=('start', 'end'))
+                self.reader = HashlistReader()
+
+        if self.originType == 'MHL':
+            from xml.etree import ElementTree
+            try:
+                self.parser.feed(data)
+                self.readEntries( self.reader.read( self.parser.read_events() ) )
+            except ElementTree.ParseError as error:
+                raise Exception("\n\n    Could not read this MHL, the XML is malformed ({}).".format(error) + "\n    " + self.filepath)
+            self.finished = self.reader.finished
+        else:
+            # Only whole lines, the last one may not have been finished yet
+            data, newline, self.pending = ( self.pending + data ).rpartition(b'\n')
+            if newline:
+                self.readPlainHashlist( data.decode('utf-8', errors='replace').splitlines() )
+
+
+class FollowComparison(Comparison):
+    # Compares an MHL against one that is still being written, as it is written.
+    # Each update only joins and checks the entries that are new, so it takes as long as
+    # there are new entries, however big the file has become.
+    # Files in the 1st are only reported missing once following stops, until then
+    # they may just not have been copied yet.
+    def __init__(self, mhlA, mhlB):
+        super().__init__(mhlA, mhlB)
+        # What in the 1st hasn't turned up in the 2nd yet, per hash, in the order they are listed
+        self.waitingA = {}
+        for hashA in self.deltaA:
+            self.waitingA.setdefault( hashA.originalIdentifier, collections.deque() ).append(hashA)
+        self.countWaiting = len(self.deltaA)
+
+    def update(self):
+        # Reads and checks whatever was added to the 2nd since the last update.
+        # Gives back how many entries were new.
+        added = self.B.update()
+        pairs = []
+        onlyB = []
+        for hashB in added:
+            waiting = self.waitingA.get(hashB.originalIdentifier)
+            if waiting:
+                pairs.append( ( waiting.popleft(), hashB ) )
+            else:
+                onlyB.append(hashB)
+        self.countWaiting -= len(pairs)
+        self.common.extend(pairs)
+        self.deltaB.extend(onlyB)
+
+        self.checkCommon(pairs)
+        self.checkDelta('B', onlyB)
+        return len(added)
+
+    def follow(self):
+        # Keeps updating until the 2nd MHL is complete, or until Ctrl-C
+        try:
+            while True:
+                new = self.update()
+                if new:
+                    self.printProgress(new)
+                    # Going to a file or another program, stdout is written in large blocks (see setupOutput()).
+                    # What was found has to get there now, not when following stops.
+                    sys.stdout.flush()
+                if self.B.finished:
+                    break
+                sys.stdout.flush()
+                time.sleep(settings.FOLLOW_INTERVAL)
+        except KeyboardInterrupt:
+            if not settings.LOG_JSON:
+                print('')
+                print('Stopped following before the 2nd MHL was complete.')
+        # Whatever never turned up
+        self.deltaA = [ hashA for waiting in self.waitingA.values() for hashA in waiting ]
+
+    def printProgress(self, new):
+        if settings.LOG_JSON:
+            return
+        summary = ', '.join(
+            '{} {}'.format( value, category.lower().replace('_', ' ') ) for category, value in self.COUNT.items() if value
+        )
+        print( '  {}  {} files in the 2nd so far (+{}), {} in the 1st not in it yet: {}'.format(
+            time.strftime('%H:%M:%S'), self.B.count(), new, self.countWaiting, summary or 'nothing checked yet'
+        ) )
+
+    def printInfo(self):
+        if self.A.originType == 'HASHLIST_PLAIN':
+            displayed_size_A = 'Size not specified (file is a simple list of checksums)'
+        else:
+            displayed_size_A = humanSize(self.A.totalSize(), showBytes=True)
+
+        print('')
+        print('1st MHL file:', color(self.A.filepath, LOG_COLOR_MHL_A) )
+        print('             ', color(str( self.A.count() ) + " files", LOG_COLOR_MHL_A) )
+        print('             ', color(displayed_size_A, LOG_COLOR_MHL_A) )
+        print('2nd MHL file:', color(self.B.filepath, LOG_COLOR_MHL_B) )
+        print('             ', color('Still being written, checked every {:g} seconds'.format(settings.FOLLOW_INTERVAL), LOG_COLOR_MHL_B) )
+        print('             ', color('Stops once the MHL is complete, or press Ctrl-C to stop sooner', LOG_COLOR_MHL_B) )
+        print('')
+        print('Progress:')
+        return
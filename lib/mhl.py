@@ -0,0 +1,673 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Reading MHLs and plain lists of checksums, and the entries listed in them.
+
+import io
+import os
+import re
+import sys
+import codecs
+import posixpath
+from datetime import datetime, timezone
+
+from . import settings
+from .settings import HASH_TYPES_ACCEPTABLE, HASHLIST_SNIFF_SIZE
+from .output import humanSize, showDigest
+from .cache import MHLCache
+
+
+# How compressed files start
+MAGIC_GZIP = b'\x1f\x8b'
+MAGIC_BZIP2 = b'BZh'
+MAGIC_XZ = b'\xfd7zXZ\x00'
+
+# A line of a plain list of checksums, like an .xxhash or .md5 file:
+# the hash, a separator, then the path of the file.
+PATTERN_HASHLIST_PLAIN = re.compile(
+    r'^(?:'
+    r'(?P<xxhash>[0-9a-fA-F]{16})(?:\s{2}|\s\?XXHASH64\*|\s\*)'
+    r'|(?P<md5>[0-9a-fA-F]{32})\s\*'
+    r')(?P<file>.*)$'
+)
+
+
+def parseDate(text, assumeUTC=False):
+    if not text:
+        return None
+    # Nearly every MHL writes plain ISO 8601, which datetime reads directly
+    # and far faster than dateutil. Only unusual formats go to dateutil.
+    try:
+        if text.endswith('Z'):
+            dt = datetime.fromisoformat(text[:-1] + '+00:00')
+        else:
+            dt = datetime.fromisoformat(text)
+    except ValueError:
+        from dateutil import parser as dateutilParser
+        dt = dateutilParser.parse(text)
+    if assumeUTC and dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def withinTolerance(dateA, dateB, seconds):
+    # Whether two dates are at most this many seconds apart. A date without a time zone
+    # can't be measured against one with a time zone, those never are.
+    if dateA is None or dateB is None or ( dateA.tzinfo is None ) != ( dateB.tzinfo is None ):
+        return False
+    return abs( ( dateA - dateB ).total_seconds() ) <= seconds
+
+
+def parseDigest(text):
+    # Hashes are kept as numbers rather than text: 64-bit hashes (xxhash64) as an int,
+    # anything else (md5, sha1) as bytes. They only become hex again when shown.
+    # Something that isn't hex at all, e.g. from a damaged MHL, is kept as the text it is.
+    text = text.lower()
+    try:
+        digest = bytes.fromhex(text)
+    except ValueError:
+        return text
+    if len(digest) * 2 != len(text):
+        # fromhex() skips spaces, but they don't belong in a hash
+        return text
+    if len(digest) == 8:
+        return int.from_bytes(digest, 'big')
+    return digest
+
+
+def hashConvertEndian(digest):
+    # Converts any given BE or LE hash, as parsed by parseDigest()
+    # And returns the opposite byte order
+    if isinstance(digest, int):
+        return int.from_bytes( digest.to_bytes(8, 'big'), 'little' )
+    if isinstance(digest, bytes):
+        return digest[::-1]
+    return codecs.encode(codecs.decode(digest, 'hex')[::-1], 'hex').decode()
+
+
+def xmlTagName(tag):
+    # ElementTree prefixes namespaced tags with '{uri}', drop it
+    return tag.rpartition('}')[2]
+
+
+def xmlElementToDict(element):
+    # Give back an element in the same shape that xmltodict did:
+    # text only as a string (None if empty), attributes as '@name',
+    # and repeated children as a list.
+    result = {}
+    for k, v in element.attrib.items():
+        result['@' + k] = v
+    for child in element:
+        tag = xmlTagName(child.tag)
+        value = xmlElementToDict(child)
+        if tag in result:
+            if not isinstance(result[tag], list):
+                result[tag] = [ result[tag] ]
+            result[tag].append(value)
+        else:
+            result[tag] = value
+    text = element.text.strip() if element.text else ''
+    if not result:
+        return text or None
+    if text:
+        result['#text'] = text
+    return result
+
+
+class HashlistReader:
+    # Turns ElementTree's start and end events for an MHL into its entries, as each one is completed.
+    # Yields ('version', str), ('creatorinfo', dict) and ('hash', dict).
+    # Each element is dropped from the tree as soon as it has been handed over.
+    # The events can all come from one file, or a few at a time from an MHL that is still being written.
+    def __init__(self):
+        self.depth = 0
+        self.root = None
+        # Once </hashlist> has been read
+        self.finished = False
+
+    def read(self, events):
+        depth = self.depth
+        root = self.root
+        try:
+            for event, element in events:
+                if event == 'start':
+                    depth += 1
+                    if depth == 1:
+                        root = element
+                        if xmlTagName(root.tag) != 'hashlist':
+                            raise Exception("\n\n    Unrecognised file: this XML file is not an MHL, it has no <hashlist>.")
+                        if 'version' in root.attrib:
+                            yield 'version', root.attrib['version']
+                    continue
+
+                depth -= 1
+                if depth != 1:
+                    if depth == 0:
+                        self.finished = True
+                    # Otherwise still inside a <hash> or other element, wait until it is complete
+                    continue
+                tag = xmlTagName(element.tag)
+                if tag == 'hash':
+                    yield 'hash', xmlElementToDict(element)
+                elif tag == 'creatorinfo':
+                    yield 'creatorinfo', xmlElementToDict(element)
+                # Done with this element
+                root.clear()
+        finally:
+            self.depth = depth
+            self.root = root
+
+
+def iterHashlist(f):
+    # Read an MHL as a stream, rather than holding the whole document in memory
+    from xml.etree import ElementTree
+    return HashlistReader().read( ElementTree.iterparse(f, events=('start', 'end')) )
+
+
+def openHashlist(filepath):
+    # Open a file to be read as bytes. One that is compressed (going by its first bytes, not its name)
+    # is decompressed a bit at a time as it is read, never to a temporary file or all at once.
+    # Each module is imported by name, so that PyInstaller sees it and includes it in the binary
+    with open(filepath, 'rb') as f:
+        magic = f.read( len(MAGIC_XZ) )
+    if magic.startswith(MAGIC_GZIP):
+        import gzip
+        return gzip.open(filepath, 'rb')
+    if magic.startswith(MAGIC_BZIP2):
+        import bz2
+        return bz2.open(filepath, 'rb')
+    if magic.startswith(MAGIC_XZ):
+        import lzma
+        return lzma.open(filepath, 'rb')
+    return open(filepath, 'rb')
+
+
+def iterPlainHashlist(f, folder=''):
+    # Read a plain list of checksums one line at a time, giving back each one the same way as a <hash> from an MHL.
+    # Lines that don't look like a checksum are skipped.
+    # With a folder (ending in /), the paths in the list are taken to be inside it.
+    for line in f:
+        match = PATTERN_HASHLIST_PLAIN.match(line)
+        if not match:
+            continue
+        if match['xxhash']:
+            hashType, hash = 'xxhash64be', match['xxhash']
+        else:
+            hashType, hash = 'md5', match['md5']
+        file = match['file']
+        if folder:
+            file = posixpath.normpath(folder + file)
+        yield {
+            'file': file,
+            'size': None,
+            hashType: hash,
+        }
+
+
+def sniffHashlistFormat(head):
+    # Decide what a file is from its first bytes, without parsing all of it:
+    # 'MHL' if it's XML, 'HASHLIST_PLAIN' if it has a line that is a checksum, otherwise None.
+    text = head.lstrip(b'\xef\xbb\xbf \t\r\n')
+    if text.startswith(b'<'):
+        return 'MHL'
+    lines = text.decode('utf-8', errors='replace').splitlines()
+    if len(head) == HASHLIST_SNIFF_SIZE:
+        # The last line was probably cut short, don't judge it
+        lines = lines[:-1]
+    for line in lines:
+        if PATTERN_HASHLIST_PLAIN.match(line):
+            return 'HASHLIST_PLAIN'
+    return None
+
+
+class EmptyHashlist(Exception):
+    # Raised when an MHL or list of checksums lists no files at all, or none that could be read
+    pass
+
+
+class MHL:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.mhlIdentifier = filepath
+        self.creatorinfo = None
+        self.clearHashes()
+
+        if settings.CACHE_ENABLED:
+            cache = MHLCache(settings.CACHE_DIRECTORY, settings.CACHE_SIZE_LIMIT, Hash.RECORD_SLOTS)
+            cacheKey = cache.describe(filepath)
+            state = cache.load(filepath, cacheKey)
+            if state is not None:
+                # Unchanged since it was last read, no need to parse it again
+                state['filepath'] = filepath
+                state['mhlIdentifier'] = filepath
+                self.__setstate__(state)
+                return
+
+        # Look at the start of the file to tell what it is, then read it just the once
+        with openHashlist(self.filepath) as f:
+            self.originType = sniffHashlistFormat( f.read(HASHLIST_SNIFF_SIZE) )
+            f.seek(0)
+
+            if self.originType == 'MHL':
+                # (1) An MHL, which is XML
+                from xml.etree import ElementTree
+                try:
+                    self.readMHL(f)
+                except ElementTree.ParseError as error:
+                    raise Exception("\n\n    Could not read this MHL, the XML is malformed ({}).".format(error) + "\n    " + filepath)
+            elif self.originType == 'HASHLIST_PLAIN':
+                # (2) A simple hashlist, such as .xxhash or .md5
+                #     This is a basic single-line per file list, with hash at the
+                #     beginning, 2 or so spaces, then filename.
+                #     Typically no other data attributes, such as found in an MHL.
+                self.readPlainHashlist( io.TextIOWrapper(f, encoding='utf-8', errors='replace') )
+            else:
+                # Tell the user we couldn't get anything useful from file.
+                raise Exception("\n\n    Unrecognised file: not an MHL nor a simple list of checksums." + "\n    " + filepath)
+
+        if not self.hashes:
+            # No hash entries listed
+            raise EmptyHashlist('There were no files found listed in this MHL file:\n    {}\nAlternatively, there was a formatting issue in the file.'.format(self.filepath))
+
+        if settings.CACHE_ENABLED:
+            cache.save(filepath, cacheKey, self)
+
+    def __getstate__(self):
+        # Used by MHLCache. Entries are stored as plain tuples, which are much
+        # quicker to save and load than the Hash objects themselves.
+        # Lookup tables are left out, they are rebuilt when needed.
+        state = {}
+        for k, v in self.__dict__.items():
+            if k not in [ 'hashes', 'attributeIndex', 'otherHashIndex' ]:
+                state[k] = v
+        state['records'] = [ hash.record() for hash in self.hashes.values() ]
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        records = state.pop('records')
+        self.__dict__.update(state)
+        self.attributeIndex = {}
+        self.otherHashIndex = {}
+        self.hashes = {}
+        for record in records:
+            hash = Hash.fromRecord(record, self.mhlIdentifier)
+            self.hashes[hash.identifier] = hash
+
+    def readMHL(self, f):
+        self.readEntries( iterHashlist(f) )
+
+    def readEntries(self, entries):
+        # Entries as they come from HashlistReader
+        for tag, value in entries:
+            if tag == 'hash':
+                self.addHash(value)
+            elif tag == 'version':
+                self.hashlist_version = value
+            elif tag == 'creatorinfo':
+                self.creatorinfo = value
+
+    def readPlainHashlist(self, f, folder=''):
+        for item in iterPlainHashlist(f, folder):
+            self.addHash(item)
+
+    def clearHashes(self):
+        self.hashes = {}
+        self.duplicates = set()
+        self.duplicateSuffix = 1
+        # Lookup tables for the find methods, each one is built the first time it is needed
+        self.attributeIndex = {}
+        self.otherHashIndex = {}
+
+    def addHash(self, item):
+        # Build a Hash from one <hash> entry and file it under its identifier
+        return self.fileHash( Hash(item, self.mhlIdentifier) )
+
+    def fileHash(self, object):
+        if object.identifier in self.hashes:
+            # Defined already
+            self.duplicates.add(object.identifier)
+            object.isDuplicate = True
+            # Shown as the hash with a suffix, e.g. 0123456789abcdef_1
+            object.identifier = ( object.identifier, self.duplicateSuffix )
+            self.duplicateSuffix += 1
+
+        self.hashes[object.identifier] = object
+
+        # Keep any lookup tables already built up to date
+        # The first hash added under a value wins, just like a search from the top would
+        for attribute, index in self.attributeIndex.items():
+            index.setdefault(attributeKey(object, attribute), object)
+        for hashType, index in self.otherHashIndex.items():
+            if hashType in object.recordedHashes:
+                index.setdefault(object.recordedHashes[hashType], object)
+        return object
+
+    def __iter__(self):
+        return iter(self.hashes)
+
+    def findHash(self, desired):
+        if desired in self.hashes.keys():
+            return self.hashes[desired]
+        else:
+            return HashNonexistent()
+
+    def findHashByAttribute(self, attribute, value):
+        # Only for attributes that stay the same after loading, like filename or directory.
+        # Give a tuple of attributes and values to search on several at once, e.g. ( 'size', 'filename' )
+        if attribute not in self.attributeIndex:
+            index = {}
+            for hash in self.hashes.values():
+                index.setdefault(attributeKey(hash, attribute), hash)
+            self.attributeIndex[attribute] = index
+        if value in self.attributeIndex[attribute]:
+            return self.attributeIndex[attribute][value]
+        else:
+            # And give them nothing if you legitimately have no search results
+            return HashNonexistent()
+
+    def findByOtherHash(self, hashType, hashValue):
+        if hashType not in self.otherHashIndex:
+            index = {}
+            for hash in self.hashes.values():
+                if hashType in hash.recordedHashes:
+                    index.setdefault(hash.recordedHashes[hashType], hash)
+            self.otherHashIndex[hashType] = index
+        if hashValue in self.otherHashIndex[hashType]:
+            return self.otherHashIndex[hashType][hashValue]
+        else:
+            return HashNonexistent()
+
+    def count(self):
+        return len(self.hashes)
+
+    def totalSize(self):
+        sum = 0
+        for h in self.hashes.values():
+            if h.sizeDefined:
+                sum += h.size
+        if self.originType == 'HASHLIST_PLAIN':
+            # Then there is no record of sizes
+            return None
+        else:
+            return sum
+
+
+class LazyDate:
+    # A date on a Hash is kept as the text from the MHL, and only parsed
+    # the first time it is asked for. Most runs never look at dates.
+    def __init__(self, name, assumeUTC=False):
+        self.slot = '_' + name
+        self.assumeUTC = assumeUTC
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Raises AttributeError if this entry doesn't have the date, just like a plain attribute
+        value = getattr(instance, self.slot)
+        if isinstance(value, str):
+            value = parseDate(value, self.assumeUTC)
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+
+# The attributes of an entry that Hash.compare() looks at, one bit each
+HASH_FIELDS = ( 'filename', 'directory', 'size', 'lastmodificationdate', 'creationdate', 'hashdate', 'hashes' )
+FIELD_FILENAME = 1 << 0
+FIELD_DIRECTORY = 1 << 1
+FIELD_SIZE = 1 << 2
+FIELD_LASTMODIFICATIONDATE = 1 << 3
+FIELD_CREATIONDATE = 1 << 4
+FIELD_HASHDATE = 1 << 5
+FIELD_HASHES = 1 << 6
+
+# Stands in for an attribute an entry doesn't have
+UNSET = object()
+
+
+def attributeKey(hash, attribute):
+    # What MHL.findHashByAttribute() files an entry under
+    if isinstance(attribute, tuple):
+        return tuple( getattr(hash, name, False) for name in attribute )
+    return getattr(hash, attribute, False)
+
+
+def fieldNames(mask):
+    # The names of the attributes in a bitmask from Hash.compare(), always in the same order
+    return [ name for bit, name in enumerate(HASH_FIELDS) if mask & (1 << bit) ]
+
+
+class Hash:
+    # There is one of these for every file in an MHL, so keep them slotted rather than
+    # each carrying a __dict__. Attributes an entry doesn't have (e.g. no creationdate)
+    # are simply left unset, so hasattr() still works on them.
+    __slots__ = (
+        'parentMHL', 'recordedHashes', 'isDuplicate',
+        'filepath', 'directory', 'filename',
+        'sizeDefined', 'size',
+        '_lastmodificationdate', '_creationdate', '_hashdate',
+        'identifier', 'identifierType', 'originalIdentifier',
+    )
+
+    # What Hash.record() stores, parentMHL comes from the MHL the record is loaded into
+    RECORD_SLOTS = tuple( name for name in __slots__ if name != 'parentMHL' )
+
+    # What compare() reads each bit from. Dates are read as stored, usually still the text from the MHL.
+    COMPARED_FIELDS = (
+        ( FIELD_FILENAME, 'filename' ),
+        ( FIELD_DIRECTORY, 'directory' ),
+        ( FIELD_SIZE, 'size' ),
+    )
+    COMPARED_DATES = (
+        ( FIELD_LASTMODIFICATIONDATE, '_lastmodificationdate', 'lastmodificationdate' ),
+        ( FIELD_CREATIONDATE, '_creationdate', 'creationdate' ),
+        ( FIELD_HASHDATE, '_hashdate', 'hashdate' ),
+    )
+
+    lastmodificationdate = LazyDate('lastmodificationdate', assumeUTC=True)
+    creationdate = LazyDate('creationdate')
+    hashdate = LazyDate('hashdate')
+
+    def __init__(self, xmlObject, mhlIdentifier):
+        self.parentMHL = mhlIdentifier
+
+        # Debug: print('xml',xmlObject, type(xmlObject))
+
+        if xmlObject['file']:
+            self.recordedHashes = {}
+            self.isDuplicate = False
+
+            # Path operations
+            self.filepath = xmlObject['file']
+            path = os.path.split( self.filepath )
+            if path[0]:
+                # If inside a folder
+                # Many files share a folder, so share the one string between them
+                self.directory = sys.intern(path[0])
+            else:
+                # If not, indicate clearly that it is at the root
+                self.directory = "/"
+            self.filename = path[1]
+        else:
+            # For some reason, the <hash> entry is missing a <file> attribute
+            # Probably should throw an error and let the user know their MHL is malformed
+            self.filepath = False
+
+
+        xmlObjectKeys = xmlObject.keys()
+
+        if 'size' in xmlObjectKeys:
+            if xmlObject['size']:
+                self.sizeDefined = True
+                self.size = int( xmlObject['size'] )
+            else:
+                # It's "None", unspecified
+                self.sizeDefined = False
+                self.size = None
+
+        # Dates stay as text for now, they are parsed if and when they are used
+        if 'lastmodificationdate' in xmlObjectKeys:
+            self.lastmodificationdate = xmlObject['lastmodificationdate']
+        if 'creationdate' in xmlObjectKeys:
+            self.creationdate = xmlObject['creationdate']
+        if 'hashdate' in xmlObjectKeys:
+            self.hashdate = xmlObject['hashdate']
+
+        # Now, we search for acceptable hash types
+        # And because our preferred hash is first in the list, it gets assigned as the identifier
+        identifierAlreadyFound = False
+        for ht in HASH_TYPES_ACCEPTABLE:
+            if ht in xmlObjectKeys:
+                # Record all acceptable hashes
+                digest = parseDigest( xmlObject[ht] )
+                self.recordedHashes[ht] = digest
+
+                if ht == 'xxhash64' and 'xxhash64be' not in self.recordedHashes:
+                    # Then the hash is LE
+                    # Convert it immediately to xxhash64be
+                    BE = hashConvertEndian(digest)
+                    # Make the BE the identifier
+                    identifier = BE
+                    identifierType = 'xxhash64be'
+
+                    # But also add the BE to recordedHashes
+                    self.recordedHashes['xxhash64be'] = BE
+                else:
+                    identifier = digest
+                    identifierType = ht
+
+                # But also grab an identifier at the same time
+                if identifierAlreadyFound:
+                    continue
+                else:
+                    self.identifier = identifier
+                    self.identifierType = identifierType
+                    # Kept as is, even if this hash turns out to be a duplicate and its identifier gets a suffix
+                    self.originalIdentifier = identifier
+                    identifierAlreadyFound = True
+
+    @property
+    def sizeHuman(self):
+        # Worked out when displayed, rather than stored for every file
+        if self.sizeDefined:
+            return humanSize(self.size)
+        else:
+            return 'Not specified'
+
+    def record(self):
+        # This entry as a compact tuple, for MHLCache: a bitmask of which
+        # attributes are set, then the value of each (None where unset).
+        # Dates are stored as they are, which is usually still the text from the MHL.
+        mask = 0
+        values = [ mask ]
+        for bit, name in enumerate(self.RECORD_SLOTS):
+            try:
+                values.append( getattr(self, name) )
+                mask |= 1 << bit
+            except AttributeError:
+                values.append(None)
+        values[0] = mask
+        return tuple(values)
+
+    @classmethod
+    def fromRecord(cls, record, mhlIdentifier):
+        hash = cls.__new__(cls)
+        hash.parentMHL = mhlIdentifier
+        mask = record[0]
+        for bit, name in enumerate(cls.RECORD_SLOTS):
+            if mask & (1 << bit):
+                setattr(hash, name, record[bit + 1])
+        return hash
+
+    @property
+    def stem(self):
+        # The filename without its extension, e.g. to find A001C001.MOV as A001C001.mov or A001C001.mxf
+        return os.path.splitext(self.filename)[0]
+
+    def report(self):
+        # The details of this file that go into --json output
+        return {
+            'filepath': self.filepath,
+            'hash': showDigest(self.identifier),
+            'hashType': self.identifierType,
+            'hashes': { hashType: showDigest(digest) for hashType, digest in self.recordedHashes.items() },
+            'size': self.size if self.sizeDefined else None,
+        }
+
+    def compare(self, other, dates=True, dateTolerance=0):
+        # How this entry differs from another, as three bitmasks of FIELD_ values:
+        # (changed, only this one has, only the other has).
+        # Dates are only parsed if their text is different, e.g. 'Z' against '+00:00',
+        # and are the same if they are at most dateTolerance seconds apart.
+        changed = onlyThis = onlyOther = 0
+        for bit, slot in self.COMPARED_FIELDS:
+            mine = getattr(self, slot, UNSET)
+            theirs = getattr(other, slot, UNSET)
+            if mine is UNSET or theirs is UNSET:
+                if mine is not UNSET:
+                    onlyThis |= bit
+                elif theirs is not UNSET:
+                    onlyOther |= bit
+            elif mine != theirs:
+                changed |= bit
+        # Hashes are compared one type at a time: a type only one of them has is not a change
+        mine = self.recordedHashes
+        theirs = other.recordedHashes
+        if mine != theirs:
+            if any( mine[hashType] != theirs[hashType] for hashType in mine.keys() & theirs.keys() ):
+                changed |= FIELD_HASHES
+            if mine.keys() - theirs.keys():
+                onlyThis |= FIELD_HASHES
+            if theirs.keys() - mine.keys():
+                onlyOther |= FIELD_HASHES
+        if dates:
+            for bit, slot, name in self.COMPARED_DATES:
+                mine = getattr(self, slot, UNSET)
+                theirs = getattr(other, slot, UNSET)
+                if mine is UNSET or theirs is UNSET:
+                    if mine is not UNSET:
+                        onlyThis |= bit
+                    elif theirs is not UNSET:
+                        onlyOther |= bit
+                elif mine != theirs:
+                    dateThis = getattr(self, name)
+                    dateOther = getattr(other, name)
+                    if dateThis != dateOther and not ( dateTolerance and withinTolerance(dateThis, dateOther, dateTolerance) ):
+                        changed |= bit
+        return changed, onlyThis, onlyOther
+
+    def __eq__(self, comparison):
+        if self.identifier == comparison.identifier:
+            return True
+        else:
+            return False
+
+    def __ne__(self, comparison):
+        if self.identifier == comparison.identifier:
+            return False
+        else:
+            return True
+
+    def __hash__(self):
+        return hash( self.identifier )
+
+    def __str__(self):
+        # By default, print the Identifier
+        return showDigest(self.identifier)
+
+    def __lt__(self, other):
+        # Aid in sorting by filepath
+        return self.filepath < other.filepath
+
+
+class HashNonexistent:
+    def __getattr__(self, attribute):
+        return None
+
+    def __setattr__(self, attribute):
+        return None
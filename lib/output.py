@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Writing results out: colour, sizes, dates, and the text and JSON output.
+
+import io
+import sys
+import atexit
+from datetime import datetime
+
+from . import settings
+from .settings import LOG_TIME_FORMAT, OUTPUT_BUFFER_SIZE
+
+
+def showDate(dt):
+    if not isinstance(dt, datetime):
+        # If for some reason, a datetime object isn't passed,
+        # just return whatever was given to you
+        return dt
+    else:
+        return dt.strftime(LOG_TIME_FORMAT)
+
+
+def humanSize(numBytes, showBytes=False):
+    if not numBytes:
+        # If for some reason you can't do maths on this 'None'
+        # Avoid it
+        return None
+    if numBytes < 1024:
+        return str(numBytes) + " bytes"
+    else:
+        if settings.LOG_SIZE_FORMAT == 'binary':
+            humanize_binary_setting = True
+        else:
+            humanize_binary_setting = False
+
+        import humanize
+        display_human_size = humanize.naturalsize(
+            numBytes,
+            binary=humanize_binary_setting,
+            format="%.2f" # 2 decimal places
+        )
+
+        # If yes, display (1024 bytes) in brackets next to the human amount.
+        if showBytes:
+            return display_human_size + ' ({} bytes)'.format(str(numBytes))
+        else:
+            return display_human_size
+
+
+def showDigest(digest):
+    # A hash as hex, however it is stored (see parseDigest)
+    if isinstance(digest, int):
+        return '{:016x}'.format(digest)
+    if isinstance(digest, bytes):
+        return digest.hex()
+    if isinstance(digest, tuple):
+        # A duplicate: the hash, and which duplicate of it this is
+        return showDigest(digest[0]) + '_' + str(digest[1])
+    return digest
+
+
+def ordinal(n):
+    # 1st, 2nd, 3rd, 4th...
+    if 10 <= n % 100 <= 20:
+        suffix = 'th'
+    else:
+        suffix = { 1: 'st', 2: 'nd', 3: 'rd' }.get(n % 10, 'th')
+    return str(n) + suffix
+
+
+def logDetail(*args):
+    if settings.LOG_VERBOSE:
+        # Same as print(), in a single write
+        sys.stdout.write( ' '.join( str(i) for i in args ) + '\n' )
+    return
+
+
+def logRecord(record):
+    # One JSON object per line, so results can be read while the comparison is still running
+    if settings.LOG_JSON:
+        import json
+        sys.stdout.write(json.dumps(record) + '\n')
+    return
+
+
+def color(text, color, **kwargs):
+    # Only print in colour if inside a terminal
+    # Don't print colour codes if they go out to a file or other
+    if settings.LOG_COLOR_ENABLED:
+        from termcolor import colored
+        return colored(text, color, **kwargs)
+    else:
+        return text
+
+
+def setupOutput():
+    # Going to a file or another program, nobody is watching the lines appear one by one.
+    # So write them out in large blocks, rather than each in a write of its own.
+    if settings.LOG_COLOR_ENABLED:
+        return
+    sys.stdout.flush()
+    stdout = io.TextIOWrapper(
+        io.BufferedWriter( io.FileIO(sys.stdout.fileno(), 'w', closefd=False), buffer_size=OUTPUT_BUFFER_SIZE ),
+        encoding=sys.stdout.encoding,
+        errors=sys.stdout.errors
+    )
+    atexit.register(stdout.flush)
+    sys.stdout = stdout
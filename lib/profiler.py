@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Measuring the time and memory each phase of a run takes (--profile).
+
+import sys
+import json
+import time
+import atexit
+import tracemalloc
+import contextlib
+
+from .output import humanSize
+
+
+def formatMemory(numBytes):
+    # humanSize() gives nothing back for 0, which a phase can easily have used
+    if not numBytes:
+        return '0 bytes'
+    return humanSize(numBytes)
+
+
+class Profiler:
+    # With --profile, measures each phase of the run: how long it took,
+    # how many blocks of memory it left allocated, and the most memory in use during it.
+    # Phases with the same name (e.g. render, before and after the checks) are added together.
+    def __init__(self, destination=None):
+        self.destination = destination
+        self.enabled = destination is not None
+        self.phases = {}
+        if self.enabled:
+            tracemalloc.start()
+            self.started = time.perf_counter()
+            atexit.register(self.report)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        tracemalloc.reset_peak()
+        blocksBefore = sys.getallocatedblocks()
+        memoryBefore = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            memoryAfter, memoryPeak = tracemalloc.get_traced_memory()
+            phase = self.phases.setdefault(name, { 'seconds': 0.0, 'blocks': 0, 'memory': 0, 'peakMemory': 0 })
+            phase['seconds'] += seconds
+            phase['blocks'] += sys.getallocatedblocks() - blocksBefore
+            phase['memory'] += memoryAfter - memoryBefore
+            phase['peakMemory'] = max( phase['peakMemory'], memoryPeak )
+
+    def report(self):
+        total = time.perf_counter() - self.started
+        peak = max( [ phase['peakMemory'] for phase in self.phases.values() ] + [ tracemalloc.get_traced_memory()[1] ] )
+        tracemalloc.stop()
+        if self.destination != '-':
+            with open(self.destination, 'w') as f:
+                json.dump({ 'phases': self.phases, 'seconds': total, 'peakMemory': peak }, f, indent=2)
+            return
+        # Straight to the terminal, after everything else has been written
+        sys.stdout.flush()
+        lines = [ '', 'Profile:', '    {:<16} {:>10} {:>12} {:>12} {:>12}'.format('phase', 'seconds', 'blocks', 'memory', 'peak memory') ]
+        for name, phase in self.phases.items():
+            lines.append( '    {:<16} {:>10.3f} {:>+12,} {:>12} {:>12}'.format(
+                name, phase['seconds'], phase['blocks'],
+                ( '-' if phase['memory'] < 0 else '+' ) + formatMemory( abs(phase['memory']) ),
+                formatMemory( phase['peakMemory'] )
+            ) )
+        lines.append( '    {:<16} {:>10.3f} {:>12} {:>12} {:>12}'.format('total', total, '', '', formatMemory(peak)) )
+        sys.stderr.write( '\n'.join(lines) + '\n' )
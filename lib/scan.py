@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Finding the MHLs on two volumes and comparing them in pairs.
+
+import os
+import sys
+
+from . import settings
+from .settings import LOG_COLOR_MHL_A, LOG_COLOR_MHL_B, LOG_COLOR_WARNING, LOG_COLOR_BOLD
+from .mhl import MHL, EmptyHashlist, iterHashlist, openHashlist
+from .compare import Comparison
+from .output import color
+
+
+# Including MHLs that were compressed to save space
+MHL_EXTENSIONS = ( '.mhl', '.mhl.gz', '.mhl.bz2', '.mhl.xz' )
+
+
+def findMHLFiles(root):
+    # Walk a volume for the MHL files on it.
+    # Gives back { path relative to the root: full path }.
+    found = {}
+    folders = [ root ]
+    while folders:
+        folder = folders.pop()
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry.path)
+                    elif entry.name.lower().endswith(MHL_EXTENSIONS) and not entry.name.startswith('._'):
+                        # (Skipping the ._ resource forks macOS leaves on non-Mac drives)
+                        found[ os.path.relpath(entry.path, root) ] = entry.path
+        except OSError:
+            # Folders we aren't allowed into, like .Trashes, are skipped
+            continue
+    return found
+
+
+def readCreatorinfo(filepath):
+    # Just the <creatorinfo> of an MHL. It comes before the hashes, so the rest is never read.
+    try:
+        with openHashlist(filepath) as f:
+            for tag, value in iterHashlist(f):
+                if tag == 'creatorinfo':
+                    return value
+                elif tag == 'hash':
+                    break
+    except Exception:
+        # Not readable as an MHL, so it can't be paired this way
+        pass
+    return None
+
+
+def pairMHLFiles(foundA, foundB):
+    # Pair MHLs on two volumes: first by their path relative to the volume,
+    # then the rest by their creator info, which is the same for copies of one MHL.
+    pairs = [ (path, path) for path in sorted(foundA) if path in foundB ]
+    leftoverA = sorted( set(foundA) - set(foundB) )
+    leftoverB = sorted( set(foundB) - set(foundA) )
+
+    def byCreatorinfo(leftover, found):
+        keys = {}
+        for path in leftover:
+            creatorinfo = readCreatorinfo( found[path] )
+            if creatorinfo:
+                key = repr( sorted(creatorinfo.items()) ) if isinstance(creatorinfo, dict) else repr(creatorinfo)
+                keys.setdefault(key, []).append(path)
+        return keys
+
+    keysA = byCreatorinfo(leftoverA, foundA)
+    keysB = byCreatorinfo(leftoverB, foundB)
+    for key, pathsA in keysA.items():
+        pathsB = keysB.get(key, [])
+        # Only when it's unambiguous
+        if len(pathsA) == 1 and len(pathsB) == 1:
+            pairs.append( (pathsA[0], pathsB[0]) )
+
+    pairedA = { a for a, b in pairs }
+    pairedB = { b for a, b in pairs }
+    onlyA = [ path for path in leftoverA if path not in pairedA ]
+    onlyB = [ path for path in leftoverB if path not in pairedB ]
+    return pairs, onlyA, onlyB
+
+
+def scanWorkerSetup(options):
+    # Worker processes start with the same settings as the command line gave
+    settings.LOG_SHOW_DATES, settings.CACHE_ENABLED = options
+    # --profile only measures the main process, don't slow the workers down with it
+    import tracemalloc
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def compareScanPair(filepaths):
+    # Runs in a worker process: a quiet comparison of one pair, giving back just the counts
+    settings.LOG_VERBOSE = False
+    try:
+        compare = Comparison( MHL(filepaths[0]), MHL(filepaths[1]) )
+    except EmptyHashlist:
+        # Nothing to compare, just skip this pair
+        return None, 'no files were listed in one of the MHLs'
+    except Exception as error:
+        return None, ' '.join( str(error).split() )
+    compare.checkCommon()
+    compare.checkDelta('A')
+    compare.checkDelta('B')
+    return compare.COUNT, None
+
+
+class VolumeComparison(Comparison):
+    # Finds the MHLs on two volumes, pairs them up, compares every pair in
+    # a pool of processes, and adds all of their counts together.
+    def __init__(self, rootA, rootB, jobs=None):
+        self.rootA = rootA
+        self.rootB = rootB
+        self.jobs = jobs
+        self.foundA = findMHLFiles(rootA)
+        self.foundB = findMHLFiles(rootB)
+        self.pairs, self.onlyA, self.onlyB = pairMHLFiles(self.foundA, self.foundB)
+        self.createCount()
+
+    def checkAll(self):
+        if not self.pairs:
+            return
+        import concurrent.futures
+        options = ( settings.LOG_SHOW_DATES, settings.CACHE_ENABLED )
+        filepaths = [ ( self.foundA[a], self.foundB[b] ) for a, b in self.pairs ]
+
+        print('')
+        print('Pairs:')
+        # Anything still waiting to be written would otherwise be copied into every worker
+        sys.stdout.flush()
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.jobs, initializer=scanWorkerSetup, initargs=(options,)) as executor:
+            # Results come back in the same order as the pairs
+            results = executor.map(compareScanPair, filepaths)
+            for (pathA, pathB), (count, error) in zip(self.pairs, results):
+                if count:
+                    for category, value in count.items():
+                        self.COUNT[category] += value
+                self.printPair(pathA, pathB, count, error)
+
+    def printPair(self, pathA, pathB, count, error):
+        if pathA == pathB:
+            name = pathA
+        else:
+            name = '{} (1st) / {} (2nd)'.format(pathA, pathB)
+        if error:
+            print( '  ' + color(name, LOG_COLOR_WARNING, attrs=LOG_COLOR_BOLD) + ': could not be compared, ' + error )
+            return
+        problems = sum( count.values() ) - count['PERFECT']
+        if problems == 0 and not settings.LOG_VERBOSE:
+            # Only mention pairs that match perfectly if the user wants detail
+            return
+        summary = ', '.join(
+            '{} {}'.format( value, category.lower().replace('_', ' ') ) for category, value in count.items() if value
+        )
+        print( '  ' + color(name, None, attrs=LOG_COLOR_BOLD) + ': ' + summary )
+
+    def printInfo(self):
+        print('')
+        print('1st volume:', color(self.rootA, LOG_COLOR_MHL_A) )
+        print('           ', color(str( len(self.foundA) ) + " MHL files", LOG_COLOR_MHL_A) )
+        print('2nd volume:', color(self.rootB, LOG_COLOR_MHL_B) )
+        print('           ', color(str( len(self.foundB) ) + " MHL files", LOG_COLOR_MHL_B) )
+        print('           ', str( len(self.pairs) ) + " pairs to compare")
+        return
+
+    def printCount(self):
+        for label, paths, listColor in [ ('1st', self.onlyA, LOG_COLOR_MHL_A), ('2nd', self.onlyB, LOG_COLOR_MHL_B) ]:
+            if paths:
+                print('')
+                print('MHL files found only on the', color(label + ' volume', listColor) + ':')
+                for path in paths:
+                    print('  ' + path)
+        super().printCount()
+        return
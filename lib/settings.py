@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Program defaults, shared by everything in lib.
+# The settings that can be changed at run time (e.g. by the command line options)
+# are read from here as settings.NAME, so a change is seen everywhere.
+
+import os
+import sys
+
+HASH_TYPE_PREFERRED = 'xxhash64be'
+HASH_TYPES_ACCEPTABLE = [ 'xxhash64be', 'xxhash64', 'xxhash', 'md5', 'sha1' ]
+
+LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+LOG_SIZE_FORMAT = 'decimal' # By default, 1000 bytes is 1 KB
+LOG_VERBOSE = False  # By default, don't show detail about which files changed
+LOG_SHOW_DATES = False # By default, don't report on modification dates, hashdates, or creationdates
+LOG_JSON = False # By default, results are written for people to read rather than as JSON
+LIST_OF_DATE_ATTRIBUTES = [ 'lastmodificationdate', 'creationdate', 'hashdate' ]
+
+LOG_COLOR_MHL_A = 'green'
+LOG_COLOR_MHL_B = 'yellow'
+LOG_COLORS_MHL = [ LOG_COLOR_MHL_A, LOG_COLOR_MHL_B, 'magenta', 'blue' ] # When comparing more than two
+LOG_COLOR_WARNING = 'red'
+LOG_COLOR_INFORMATION = 'cyan'
+LOG_COLOR_BOLD = [ 'bold' ]
+LOG_COLOR_ENABLED = os.isatty(1) # Checked just the once, colour only goes to a terminal
+
+# Output to a file or pipe is written in blocks of this size
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+if getattr( sys, 'frozen', False ):
+    LOG_APPTYPE = 'CLI'
+else:
+    LOG_APPTYPE = 'Python'
+
+LOG_VERSION = '0.4'
+LOG_AUTHOR_AND_LICENSE = '(Author: Sebastian Reategui) (MIT License) (2020-03-21)'
+LOG_STARTUP_LINE = 'mhl-compare (v{}) ({}) {}'.format(
+    LOG_VERSION, LOG_APPTYPE, LOG_AUTHOR_AND_LICENSE)
+
+# Parsed MHLs are kept in a cache, so files that haven't changed aren't parsed again
+CACHE_ENABLED = True
+if sys.platform == 'darwin':
+    CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), 'Library', 'Caches', 'mhl-compare')
+else:
+    CACHE_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'mhl-compare')
+CACHE_SIZE_LIMIT = 512 * 1024 * 1024 # Least recently used entries are removed beyond this
+CACHE_FINGERPRINT_SIZE = 64 * 1024 # How much of the start and end of a file goes into its fingerprint
+CACHE_FORMAT = 2 # Increase whenever what is stored changes
+
+# With NumPy installed, pairs in common are counted all at once rather than one at a time.
+# Below this many, it isn't worth it.
+COMPARE_VECTORISE_MINIMUM = 10000
+
+# How many files have to have moved together before their folder is reported as renamed or moved
+COMPARE_FOLDER_MOVE_MINIMUM = 2
+# and how many of those folders are listed in the summary (--info lists them all)
+COMPARE_FOLDER_MOVE_SUMMARY = 5
+
+# How much of the start of a file to look at, to tell what kind of file it is
+HASHLIST_SNIFF_SIZE = 64 * 1024
+
+# With --follow, how often to look for entries added to the file being written (in seconds)
+FOLLOW_INTERVAL = 5
+# and how much of what was added to read at a time
+FOLLOW_READ_SIZE = 1024 * 1024
+
+# Lists of checksums looked for in a folder, when it is given in place of an MHL
+SIDECAR_EXTENSIONS = tuple( name + compressed for name in ( '.md5', '.xxhash', '.xxh', '.xxh64' ) for compressed in ( '', '.gz', '.bz2', '.xz' ) )
+# How many of them are read at once
+SIDECAR_THREADS = 16
+
+# With --verify, how many files are hashed at once. Kept low, so a spinning disk isn't made to seek between too many files
+VERIFY_THREADS = 4
+# and how much of each file is read at a time
+VERIFY_BUFFER_SIZE = 8 * 1024 * 1024
+
+# With --stat, how many folders are looked in at once
+STAT_THREADS = 16
+# and how far apart (in seconds) modification dates can be and still be the same, e.g. FAT only keeps them to 2 seconds
+STAT_DATE_TOLERANCE = 2
+
+# With --memory-limit, roughly how much memory (in bytes) one entry takes up while it is held, to work out how many fit
+EXTERNAL_ENTRY_SIZE = 900
+# how many entries are written to, and read from, a temporary file at a time
+EXTERNAL_BLOCK_SIZE = 100
+# and at most how many pairs in common are checked at a time
+EXTERNAL_BATCH_SIZE = 10000
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Reading many small lists of checksums as if they were one.
+# Some software writes an .md5 or .xxhash per folder, or even per clip, rather than one MHL.
+
+import os
+import glob
+
+from . import settings
+from .settings import HASHLIST_SNIFF_SIZE, SIDECAR_EXTENSIONS
+from .mhl import MHL, EmptyHashlist, openHashlist, sniffHashlistFormat
+
+
+def isSidecarSource(source):
+    # A folder, a glob like 'card/**/*.md5', or '@' and the path of a file listing them one per line.
+    # A file that exists is always just that file, even if its name has [ ] or starts with @
+    if os.path.isfile(source):
+        return False
+    return source.startswith('@') or os.path.isdir(source) or any( c in source for c in '*?[' )
+
+
+def findSidecarFiles(source):
+    # Gives back the lists of checksums, and the folder that paths in them are made relative to
+    if source.startswith('@'):
+        manifest = source[1:]
+        with open(manifest, encoding='utf-8') as f:
+            # Paths in the manifest are relative to where the manifest is
+            filepaths = [ os.path.join( os.path.dirname(manifest), line.strip() ) for line in f if line.strip() ]
+        base = None
+    elif os.path.isdir(source):
+        filepaths = []
+        for folder, subfolders, filenames in os.walk(source):
+            subfolders.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(SIDECAR_EXTENSIONS) and not filename.startswith('._'):
+                    filepaths.append( os.path.join(folder, filename) )
+        base = source
+    else:
+        filepaths = sorted( glob.glob(source, recursive=True) )
+        base = None
+    if base is None and filepaths:
+        # The folder they all have in common
+        base = os.path.commonpath([ os.path.dirname( os.path.abspath(filepath) ) for filepath in filepaths ])
+        filepaths = [ os.path.abspath(filepath) for filepath in filepaths ]
+    return filepaths, base
+
+
+def readSidecar(filepath):
+    # Runs in a thread. Only reading the file, which is mostly waiting on the disk or network
+    with openHashlist(filepath) as f:
+        return f.read()
+
+
+class SidecarMHL(MHL):
+    # Many lists of checksums loaded as one MHL. Each file's entries are listed under the folder
+    # that file is in, relative to the others, as if one list had been written from the top.
+    # The files are read by a pool of threads, so that the time it takes to open each one
+    # (which adds up, on a network share) is spent on many at once.
+    def __init__(self, source):
+        self.filepath = source
+        self.mhlIdentifier = source
+        self.creatorinfo = None
+        self.originType = 'HASHLIST_PLAIN'
+        self.clearHashes()
+
+        self.sidecars, base = findSidecarFiles(source)
+        if not self.sidecars:
+            raise FileNotFoundError('\n\nCould not find any lists of checksums here. Check the path for typos?\n{}'.format(source))
+
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=settings.SIDECAR_THREADS) as executor:
+            # Results come back in the same order as the files, so the entries are always in the same order
+            for filepath, data in zip( self.sidecars, executor.map(readSidecar, self.sidecars) ):
+                if sniffHashlistFormat( data[:HASHLIST_SNIFF_SIZE] ) != 'HASHLIST_PLAIN':
+                    raise Exception("\n\n    Unrecognised file: not a simple list of checksums." + "\n    " + filepath)
+                folder = os.path.relpath( os.path.dirname(filepath), base )
+                if folder == os.curdir:
+                    folder = ''
+                else:
+                    # Entries are given with / whatever the system, as they are in an MHL
+                    folder = folder.replace(os.sep, '/') + '/'
+                self.readPlainHashlist( data.decode('utf-8', errors='replace').splitlines(), folder )
+
+        if not self.hashes:
+            raise EmptyHashlist('There were no files found listed in these lists of checksums:\n    {}\nAlternatively, there was a formatting issue in the files.'.format(self.filepath))
+
+
+def loadMHL(source):
+    # An MHL or list of checksums, or many lists of checksums given as a folder, glob or @manifest
+    if isSidecarSource(source):
+        return SidecarMHL(source)
+    return MHL(source)
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+# (c) Sebastian Reategui 2019, all rights reserved
+# MIT License
+
+# Checking the files on a disk against an MHL: by hashing them again, or just by their size.
+
+import os
+import threading
+from datetime import datetime, timezone
+
+from . import settings
+from .settings import HASH_TYPES_ACCEPTABLE, LOG_COLOR_MHL_A, LOG_COLOR_MHL_B, LOG_COLOR_WARNING, LOG_COLOR_INFORMATION, LOG_COLOR_BOLD
+from .mhl import MHL
+from .compare import Comparison
+from .output import color, humanSize, showDate, showDigest, logDetail, logRecord
+
+
+# Each thread reads into a buffer of its own, made just the once
+buffers = threading.local()
+
+
+def importXxhash():
+    # xxhash is optional. Without it, files only listed with an xxHash are hashed with MD5 instead,
+    # and reported as having hash types that can't be compared.
+    try:
+        import xxhash
+    except ImportError:
+        return None
+    return xxhash
+
+
+def chooseHashType(hash, xxhash):
+    # The hash type to check a file with: the first one it was listed with that can be worked out here
+    for hashType in HASH_TYPES_ACCEPTABLE:
+        if hashType in hash.recordedHashes:
+            if hashType.startswith('xxhash'):
+                if xxhash is not None:
+                    # Either byte order of an xxHash64 is listed as big endian once it is read
+                    return 'xxhash' if hashType == 'xxhash' else 'xxhash64be'
+            else:
+                return hashType
+    return 'md5'
+
+
+def hashFile(filepath, hashType):
+    # Reads a file from start to end in large blocks, so that a spinning disk reads one long stretch
+    # at a time rather than seeking back and forth between files.
+    # Gives back the hash as hex, or None if the file can't be read.
+    if hashType == 'xxhash64be':
+        hasher = importXxhash().xxh64()
+    elif hashType == 'xxhash':
+        hasher = importXxhash().xxh32()
+    else:
+        import hashlib
+        hasher = hashlib.new(hashType)
+    buffer = getattr(buffers, 'buffer', None)
+    if buffer is None or len(buffer) != settings.VERIFY_BUFFER_SIZE:
+        buffer = buffers.buffer = bytearray(settings.VERIFY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    try:
+        # Unbuffered, the blocks go straight into the one buffer
+        with open(filepath, 'rb', buffering=0) as f:
+            while True:
+                size = f.readinto(buffer)
+                if not size:
+                    break
+                hasher.update( view[:size] )
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def verifyFile(task):
+    # Runs in a thread. Gives back the file as an MHL entry would list it, or None if it isn't there.
+    filepath, fullPath, hashType = task
+    try:
+        stat = os.stat(fullPath)
+    except OSError:
+        return None
+    digest = hashFile(fullPath, hashType)
+    if digest is None:
+        return None
+    return {
+        'file': filepath,
+        'size': str(stat.st_size),
+        'lastmodificationdate': datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+        hashType: digest,
+    }
+
+
+class DiskMHL(MHL):
+    # What is actually on the disk for the files an MHL lists: each one hashed again, with the hash
+    # type the MHL has for it, and listed with its size and modification date as they are now.
+    # Files that are missing or can't be read are left out.
+    # The files are read by a few threads at once, in order of their path so that files
+    # in the same folder are read one after another.
+    def __init__(self, mhl, root, jobs=None):
+        self.filepath = root
+        self.mhlIdentifier = root
+        self.creatorinfo = None
+        self.originType = 'DISK'
+        self.clearHashes()
+
+        xxhash = importXxhash()
+        tasks = [
+            ( hash.filepath, os.path.join( root, *hash.filepath.split('/') ), chooseHashType(hash, xxhash) )
+            for hash in sorted( hash for hash in mhl.hashes.values() if hash.filepath )
+        ]
+
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or settings.VERIFY_THREADS) as executor:
+            for item in executor.map(verifyFile, tasks):
+                if item is not None:
+                    self.addHash(item)
+
+
+class VerifyComparison(Comparison):
+    # Checks each file an MHL lists against what was read from the disk at the same path (see DiskMHL).
+    # Every file on the disk was found from its own entry, so they are paired by path alone,
+    # never by hash or by name: a file that is missing stays missing, even if a file of the same name is elsewhere.
+    def __init__(self, mhl, root, jobs=None):
+        self.A = mhl
+        self.B = DiskMHL(mhl, root, jobs=jobs)
+        self.root = root
+        # As with --stat, the disk may keep modification dates less precisely than the MHL did
+        self.dateTolerance = settings.STAT_DATE_TOLERANCE
+
+        onDisk = {}
+        for hashB in self.B.hashes.values():
+            onDisk.setdefault(hashB.filepath, []).append(hashB)
+        self.common = []
+        self.deltaA = []
+        for hashA in self.A.hashes.values():
+            if not hashA.filepath:
+                continue
+            found = onDisk.get(hashA.filepath)
+            if found:
+                # The same path listed twice was read twice, pair them off in order
+                self.common.append( ( hashA, found.pop(0) ) )
+            else:
+                self.deltaA.append(hashA)
+        self.deltaB = []
+        self.createCount()
+
+    def checkAll(self):
+        same = []
+        for hashA, hashB in sorted( self.common, key=lambda pair: pair[0].filepath ):
+            if hashB.identifierType not in hashA.recordedHashes:
+                # e.g. only an xxHash in the MHL, but xxhash isn't installed so the file was hashed with MD5
+                self.COUNT['HASH_TYPE_DIFFERENT'] += 1
+                self.recordFile('HASH_TYPE_DIFFERENT', hashA, hashB, hashA.compare( hashB, dates=settings.LOG_SHOW_DATES, dateTolerance=self.dateTolerance ))
+                logDetail( '  ' + color( hashA.filename, None, attrs=LOG_COLOR_BOLD ) )
+                logDetail( '      Path:', hashA.directory )
+                logDetail( color( "      Hash: can't be checked, the MHL only has hashes of a type that isn't available ({}).".format( ', '.join(hashA.recordedHashes) ), LOG_COLOR_INFORMATION ) )
+            elif hashB.originalIdentifier != hashA.recordedHashes[hashB.identifierType]:
+                self.COUNT['HASH_CHANGED'] += 1
+                self.recordFile('HASH_CHANGED', hashA, hashB, hashA.compare( hashB, dates=settings.LOG_SHOW_DATES, dateTolerance=self.dateTolerance ))
+                logDetail( '  ' + color( hashA.filename, None, attrs=LOG_COLOR_BOLD ) )
+                logDetail( '      Path:', hashA.directory )
+                logDetail( color( '      Hash: different on the disk. The file has changed, or was not copied correctly.', LOG_COLOR_WARNING ) )
+                logDetail( '      Hash  (MHL):', color( '{} ({})'.format( showDigest( hashA.recordedHashes[hashB.identifierType] ), hashB.identifierType ), LOG_COLOR_MHL_A ) )
+                logDetail( '            (disk):', color( '{} ({})'.format( showDigest(hashB.originalIdentifier), hashB.identifierType ), LOG_COLOR_MHL_B ) )
+                if getattr(hashA, 'sizeDefined', False) and hashA.size != hashB.size:
+                    logDetail( '      Size: different (MHL):', color( humanSize(hashA.size, showBytes=True), LOG_COLOR_MHL_A ) )
+                    logDetail( '                     (disk):', color( humanSize(hashB.size, showBytes=True), LOG_COLOR_MHL_B ) )
+            else:
+                same.append( ( hashA, hashB ) )
+        # The same hash: the rest (size, and dates with --dates) is checked as for any pair in common
+        self.checkCommon(same)
+
+        for hashA in sorted(self.deltaA):
+            self.COUNT['MISSING'] += 1
+            self.recordFile('MISSING', hashA, None)
+            logDetail( '  ' + color( hashA.filename, LOG_COLOR_MHL_A, attrs=LOG_COLOR_BOLD ) )
+            logDetail( '      Missing from the disk, or could not be read.' )
+            logDetail( '      Path:', hashA.directory )
+            logDetail( '      Size:', hashA.sizeHuman )
+
+    def describeOutcomes(self):
+        outcomes = super().describeOutcomes()
+        outcomes['HASH_CHANGED'] = {
+            'desc': 'had a different hash on the disk. They have changed, or were not copied correctly',
+            'desc_singular': 'had a different hash on the disk. It has changed, or was not copied correctly',
+            'color': LOG_COLOR_WARNING
+        }
+        outcomes['HASH_TYPE_DIFFERENT'] = {
+            'desc': "could not be checked, the MHL only has hashes of a type that isn't available",
+            'color': LOG_COLOR_INFORMATION
+        }
+        outcomes['MISSING'] = {
+            'desc': 'were listed in the MHL, but missing from the disk or could not be read',
+            'desc_singular': 'was listed in the MHL, but missing from the disk or could not be read',
+            'color': LOG_COLOR_WARNING
+        }
+        return outcomes
+
+
+def isIgnored(name):
+    # Files that are on a disk but never listed: resource forks macOS leaves on non-Mac drives,
+    # Finder's folder settings, and MHLs themselves
+    return name.startswith('._') or name == '.DS_Store' or name.lower().endswith('.mhl')
+
+
+def scanFolder(folder, prefix):
+    # Runs in a thread: the files in one folder, as { path relative to the root: ( size, modification time ) },
+    # and the folders in it to look in next
+    files = {}
+    folders = []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append( ( entry.path, prefix + entry.name + '/' ) )
+                    elif not isIgnored(entry.name):
+                        stat = entry.stat()
+                        files[ prefix + entry.name ] = ( stat.st_size, stat.st_mtime )
+                except OSError:
+                    continue
+    except OSError:
+        # Folders we aren't allowed into, like .Trashes, are skipped
+        pass
+    return files, folders
+
+
+def findFiles(root, jobs=None):
+    # Every file under the root, found by a pool of threads that each look in one folder at a time.
+    # Only the folders are read, never the files, so it takes as long as there are folders and files.
+    import concurrent.futures
+    found = {}
+    folderCount = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or settings.STAT_THREADS) as executor:
+        pending = { executor.submit(scanFolder, root, '') }
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                files, folders = future.result()
+                folderCount += 1
+                found.update(files)
+                pending.update( executor.submit(scanFolder, folder, prefix) for folder, prefix in folders )
+    return found, folderCount
+
+
+class StatComparison(Comparison):
+    # A quick check of the files on a disk against an MHL, by their sizes alone: which are missing,
+    # which are a different size (e.g. a copy that was cut short) and which aren't in the MHL at all.
+    # Nothing is hashed, so this takes minutes where --verify would take hours.
+    UNMATCHED = ( 'MISSING', 'EXTRA' )
+
+    def __init__(self, mhl, root, jobs=None):
+        self.A = mhl
+        self.root = root
+        self.found, self.folderCount = findFiles(root, jobs=jobs)
+        self.createCount()
+
+    def createCount(self):
+        self.COUNT = {
+            'PERFECT': 0,  # There, and the same size
+            'MINOR': 0,  # The same size but modified at a different time (only with --dates)
+            'SIZE_DIFFERENT': 0,
+            'MISSING': 0,  # Listed in the MHL, but not on the disk
+            'EXTRA': 0,  # On the disk, but not listed in the MHL
+        }
+
+    def recordFile(self, category, filepath, hash, found):
+        # With --json, one line per file
+        logRecord({
+            'type': 'file',
+            'category': category,
+            'filepath': filepath,
+            'size': hash.size if getattr(hash, 'sizeDefined', False) else None,
+            'sizeOnDisk': found[0] if found else None,
+        })
+
+    def checkAll(self):
+        listed = set()
+        for hash in sorted( hash for hash in self.A.hashes.values() if hash.filepath ):
+            listed.add(hash.filepath)
+            found = self.found.get(hash.filepath)
+            if found is None:
+                self.COUNT['MISSING'] += 1
+                self.recordFile('MISSING', hash.filepath, hash, None)
+                logDetail( '  ' + color( hash.filename, LOG_COLOR_MHL_A, attrs=LOG_COLOR_BOLD ) )
+                logDetail( '      Missing from the disk.' )
+                logDetail( '      Path:', hash.directory )
+                logDetail( '      Size:', hash.sizeHuman )
+                continue
+
+            size, mtime = found
+            if getattr(hash, 'sizeDefined', False) and size != hash.size:
+                self.COUNT['SIZE_DIFFERENT'] += 1
+                self.recordFile('SIZE_DIFFERENT', hash.filepath, hash, found)
+                logDetail( '  ' + color( hash.filename, None, attrs=LOG_COLOR_BOLD ) )
+                logDetail( '      Path:', hash.directory )
+                logDetail( '      Size: different (MHL):', color( humanSize(hash.size, showBytes=True), LOG_COLOR_MHL_A ) )
+                logDetail( '                     (disk):', color( humanSize(size, showBytes=True), LOG_COLOR_MHL_B ) )
+                continue
+
+            if settings.LOG_SHOW_DATES and getattr(hash, 'lastmodificationdate', None):
+                modified = datetime.fromtimestamp(mtime, timezone.utc)
+                if abs( ( modified - hash.lastmodificationdate ).total_seconds() ) > settings.STAT_DATE_TOLERANCE:
+                    self.COUNT['MINOR'] += 1
+                    self.recordFile('MINOR', hash.filepath, hash, found)
+                    logDetail( '  ' + color( hash.filename, None, attrs=LOG_COLOR_BOLD ) )
+                    logDetail( '      Path:', hash.directory )
+                    logDetail( '      Modified date: different (MHL):', color( showDate(hash.lastmodificationdate), LOG_COLOR_MHL_A ) )
+                    logDetail( '                              (disk):', color( showDate(modified), LOG_COLOR_MHL_B ) )
+                    continue
+
+            self.COUNT['PERFECT'] += 1
+            self.recordFile('PERFECT', hash.filepath, hash, found)
+
+        for filepath in sorted( set(self.found) - listed ):
+            self.COUNT['EXTRA'] += 1
+            self.recordFile('EXTRA', filepath, None, self.found[filepath])
+            directory, filename = os.path.split(filepath)
+            logDetail( '  ' + color( filename, LOG_COLOR_MHL_B, attrs=LOG_COLOR_BOLD ) )
+            logDetail( '      Not listed in the MHL.' )
+            logDetail( '      Path:', directory or '/' )
+            logDetail( '      Size:', humanSize( self.found[filepath][0], showBytes=True ) )
+
+    def recordSummary(self):
+        logRecord({
+            'type': 'summary',
+            '1st': self.A.filepath,
+            'disk': self.root,
+            'counts': self.COUNT,
+        })
+
+    def printInfo(self):
+        print('')
+        print('MHL file:', color(self.A.filepath, LOG_COLOR_MHL_A) )
+        print('         ', color(str( self.A.count() ) + " files", LOG_COLOR_MHL_A) )
+        print('Disk:    ', color(self.root, LOG_COLOR_MHL_B) )
+        print('         ', color('{} files in {} folders'.format( len(self.found), self.folderCount ), LOG_COLOR_MHL_B) )
+        return
+
+    def describeOutcomes(self):
+        return {
+            'PERFECT': {
+                'desc': 'were on the disk, and the same size'
+                },
+            'MINOR': {
+                'desc': 'were the same size, but modified at a different time',
+                'desc_singular': 'was the same size, but modified at a different time'
+                },
+            'SIZE_DIFFERENT': {
+                'desc': 'were a different size on the disk. They may not have been copied in full',
+                'desc_singular': 'was a different size on the disk. It may not have been copied in full',
+                'color': LOG_COLOR_WARNING
+                },
+            'MISSING': {
+                'desc': 'were listed in the MHL, but missing from the disk',
+                'desc_singular': 'was listed in the MHL, but missing from the disk',
+                'color': LOG_COLOR_WARNING
+                },
+            'EXTRA': {
+                'desc': 'were on the disk, but not listed in the MHL',
+                'desc_singular': 'was on the disk, but not listed in the MHL'
+                },
+            }
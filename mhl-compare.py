@@ -4,933 +4,363 @@
 # (c) Sebastian Reategui 2019, all rights reserved
 # MIT License
 
-import sys
+# The command line. Everything else is in lib/, which can also be imported and used directly:
+#
+#   from lib import MHL, Comparison
+
 import os
+import sys
 import argparse
-import codecs
-import re
+import tempfile
 import itertools
-from datetime import datetime
-
-import xmltodict
-import humanize
-from dateutil.tz import tzutc
-from dateutil import parser as dateutilParser
-from termcolor import colored
-from dictdiffer import DictDiffer
-
-# Program defaults
-HASH_TYPE_PREFERRED = 'xxhash64be'
-HASH_TYPES_ACCEPTABLE = [ 'xxhash64be', 'xxhash64', 'xxhash', 'md5', 'sha1' ]
-
-LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
-LOG_SIZE_FORMAT = 'decimal' # By default, 1000 bytes is 1 KB
-LOG_VERBOSE = False  # By default, don't show detail about which files changed
-LOG_SHOW_DATES = False # By default, don't report on modification dates, hashdates, or creationdates
-LIST_OF_DATE_ATTRIBUTES = [ 'lastmodificationdate', 'creationdate', 'hashdate' ]
-
-LOG_COLOR_MHL_A = 'green'
-LOG_COLOR_MHL_B = 'yellow'
-LOG_COLOR_WARNING = 'red'
-LOG_COLOR_INFORMATION = 'cyan'
-LOG_COLOR_BOLD = [ 'bold' ]
-
-if getattr( sys, 'frozen', False ):
-    LOG_APPTYPE = 'CLI'
-else:
-    LOG_APPTYPE = 'Python'
-
-LOG_VERSION = '0.4'
-LOG_AUTHOR_AND_LICENSE = '(Author: Sebastian Reategui) (MIT License) (2020-03-21)'
-LOG_STARTUP_LINE = 'mhl-compare (v{}) ({}) {}'.format(
-    LOG_VERSION, LOG_APPTYPE, LOG_AUTHOR_AND_LICENSE)
-
-print('--------------')
-print(LOG_STARTUP_LINE)
-
-
-def showDate(dt):
-    if not isinstance(dt, datetime):
-        # If for some reason, a datetime object isn't passed,
-        # just return whatever was given to you
-        return dt
-    else:
-        return dt.strftime(LOG_TIME_FORMAT)
 
+from lib import settings
+from lib.settings import LOG_STARTUP_LINE, LOG_COLOR_BOLD, LIST_OF_DATE_ATTRIBUTES
+from lib.compare import Comparison, MultiComparison
+from lib.scan import VolumeComparison
+from lib.follow import FollowedMHL, FollowComparison
+from lib.mhl import EmptyHashlist
+from lib.sidecar import loadMHL, isSidecarSource
+from lib.verify import VerifyComparison, StatComparison
+from lib.external import SortedComparison
+from lib.output import color, humanSize, showDigest, ordinal, logDetail, logRecord, setupOutput
+from lib.profiler import Profiler
 
-def humanSize(numBytes, showBytes=False):
-    if not numBytes:
-        # If for some reason you can't do maths on this 'None'
-        # Avoid it
-        return None
-    if numBytes < 1024:
-        return str(numBytes) + " bytes"
-    else:
-        if LOG_SIZE_FORMAT == 'binary':
-            humanize_binary_setting = True
-        else:
-            humanize_binary_setting = False
 
-        display_human_size = humanize.naturalsize(
-            numBytes,
-            binary=humanize_binary_setting,
-            format="%.2f" # 2 decimal places
-        )
-
-        # If yes, display (1024 bytes) in brackets next to the human amount.
-        if showBytes:
-            return display_human_size + ' ({} bytes)'.format(str(numBytes))
-        else:
-            return display_human_size
-
-
-def logDetail(*args, **kwargs):
-    if LOG_VERBOSE:
-        print(*args, **kwargs, end='\n')
-    return
+#####
 
 
-def color(text, color, **kwargs):
-    # Only print in colour if inside a terminal
-    # Don't print colour codes if they go out to a file or other
-    if os.isatty(1):
-        return colored(text, color, **kwargs)
+if __name__ == '__main__':
+    if getattr( sys, 'frozen', False ):
+        # Needed for --scan in the standalone binary
+        import multiprocessing
+        multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument( "FILEPATH", nargs='+', help="Path to the first file")
+    parser.add_argument(
+        "-v", "--verbose", "--info",
+        help="gives greater detail on all files affected",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-b", "--binary",
+        help="Shows sizes in binary format, appropriate for Windows (1024 bytes = 1 KiB)",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-d", "--dates",
+        help="Report on differences in modification date, creation date or hash date",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="Always read MHL files in full, rather than using or updating the cache of previously read files",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--scan",
+        help="Treat the two paths as volumes: find the MHL files on each, pair them up by path or by creator info, and compare every pair",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        help="How many comparisons to run at once with --scan (default: one per CPU), files to hash at once with --verify (default: {}), or folders to look in at once with --stat (default: {})".format(settings.VERIFY_THREADS, settings.STAT_THREADS),
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--verify",
+        help="Check the files in this folder against the one MHL given, by hashing them again",
+        metavar="MEDIA_ROOT"
+    )
+    parser.add_argument(
+        "--stat",
+        help="Check the files in this folder against the one MHL given, by their size alone: which are missing, a different size, or not listed. Much quicker than --verify",
+        metavar="MEDIA_ROOT"
+    )
+    parser.add_argument(
+        "--follow",
+        help="The 2nd file is still being written (e.g. during an offload): keep reading what is added to it and check it as it comes, until the MHL is complete or Ctrl-C is pressed",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--interval",
+        help="How often to check for new entries with --follow, in seconds (default: {:g})".format(settings.FOLLOW_INTERVAL),
+        type=float,
+        default=None
+    )
+    parser.add_argument(
+        "--memory-limit",
+        help="For MHLs too big to fit in memory: sort them in temporary files and compare them in about this much memory, in MB. The temporary files go in the system's temporary folder, or TMPDIR",
+        metavar="MB",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--profile",
+        help="Measure the time and memory taken by each step, and show them at the end (on stderr). Makes the program run slower",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--profile-json",
+        help="Like --profile, but save the measurements as JSON to this file",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "--json",
+        help="Write the result as JSON, one line per file as it is checked and then a summary, instead of text",
+        action="store_true"
+    )
+    args = parser.parse_args()
+    setupOutput()
+
+    if args.follow and ( args.scan or len(args.FILEPATH) != 2 ):
+        parser.error('--follow is only available when comparing two files')
+
+    if args.memory_limit is not None and ( args.scan or args.follow or args.verify or args.stat or len(args.FILEPATH) != 2 ):
+        parser.error('--memory-limit is only available when comparing two files')
+    if args.memory_limit is not None and args.memory_limit <= 0:
+        parser.error('--memory-limit must be more than 0')
+    if args.memory_limit is not None and any( isSidecarSource(filepath) for filepath in args.FILEPATH ):
+        parser.error('--memory-limit is only available for MHLs and lists of checksums, not folders of them')
+
+    if args.verify and args.stat:
+        parser.error('choose either --verify or --stat')
+    if ( args.verify or args.stat ) and ( args.scan or args.follow or len(args.FILEPATH) != 1 ):
+        parser.error('--verify and --stat check the files on disk against one MHL, specify exactly one')
+
+    if args.json:
+        if args.scan or len(args.FILEPATH) != ( 1 if args.verify or args.stat else 2 ):
+            parser.error('--json is only available when comparing two files')
+        settings.LOG_JSON = True
     else:
-        return text
-
-
-def hashConvertEndian(hashString):
-    # Converts any given BE or LE hash, as a string
-    # And returns the opposite byte order
-    return codecs.encode(codecs.decode(hashString, 'hex')[::-1], 'hex').decode()
-
-
-
-class MHL:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.mhlIdentifier = filepath
-        self.hashes = {}
-        self.duplicates = set()
-
-        PATTERNS_HASHLIST_SIMPLE = [
-            '^([0-9a-fA-F]{16})\s{2}(.*)$',
-            '^([0-9a-fA-F]{16})\s\?XXHASH64\*(.*)$',
-            '^([0-9a-fA-F]{16})\s\*(.*)$',
-            '^([0-9a-fA-F]{32})\s\*(.*)$'
-        ]
-
-        # (1) Try to parse it as XML
-        try:
-            with open(self.filepath, 'r') as f:
-                listObj = xmltodict.parse( f.read(), dict_constructor=dict )
-                self.originType = 'MHL'
-        except:
-            # (2) Try parsing this as an .xxhash simple hashlist
-            #     This is a basic single-line per file list, with hash at the
-            #     beginning, 2 or so spaces, then filename.
-            #     Typically no other data attributes, such as found in an MHL.
-            with open(filepath, 'r') as f:
-                lines = f.readlines()
-                # We will create a "faux MHL" with XML structure.
-                # The rest of Class MHL() will then navigate this XML just like
-                # it would our regular .mhl files.
-                fauxMHL = {
-                    '_ORIGIN': os.path.basename(filepath),
-                    'hashlist': {
-                        'hash': []
-                    }
-                }
-                for line in lines:
-                    # Now test each line against our identified patterns above.
-                    match = False
-                    for pattern in PATTERNS_HASHLIST_SIMPLE:
-                        match = re.compile(pattern).match(line)
-                        if match:
-                            # Found a match, work with it
-                            break
-                        else:
-                            # Keep going until we match
-                            continue
-                    if match:
-                        hash = match[1]
-                        hashFilepath = match[2]
-                        fauxMHL_hash = {
-                            'file': hashFilepath,
-                            'size': None,
-                            'xxhash64be': hash,
-                        }
-                        fauxMHL['hashlist']['hash'].append(fauxMHL_hash)
-                    else:
-                        # This line doesn't match, keep moving on.
-                        continue
-                if len(fauxMHL['hashlist']['hash']) == 0:
-                    # If no lines matched, then no hashes were added.
-                    # Tell the user we couldn't get anything useful from file.
-                    raise Exception("\n\n    Unrecognised file: not an MHL nor a simple list of checksums." + "\n    " + filepath)
-                # Now introduce the imposter XML.
-                listObj = fauxMHL
-                self.originType = 'HASHLIST_PLAIN'
-
-        if '@version' in listObj['hashlist']:
-            self.hashlist_version = listObj['hashlist']['@version']
-
-        if 'creatorinfo' in listObj['hashlist']:
-            self.creatorinfo = listObj['hashlist']['creatorinfo']
-        else:
-            self.creatorinfo = None
-
-        if 'hash' not in listObj['hashlist']:
-            # No hash entries listed
-            print('There were no files found listed in this MHL file:\n    {}\nAlternatively, there was a formatting issue in the file.'.format(self.filepath))
-            sys.exit(0)
-
-        hashTree = listObj['hashlist']['hash']
-        if isinstance( hashTree, list ):
-            # More than one hash, so it's already in a list format
-            list_of_hashes = hashTree
-        elif isinstance( hashTree, dict ):
-            # Else, it's just one hash, put it inside a list so we can iterate
-            list_of_hashes = [ hashTree ]
-        else:
-            raise Exception("Couldn't find any valid hashes. Here, I was expecting to be given a list of dicts, or a dict itself.")
-
-        HashDuplicateSuffix = 1
-        for item in list_of_hashes:
-            object = Hash(item, self.mhlIdentifier)
-
-            if object.identifier in self.hashes.keys():
-                # Defined already
-                self.duplicates.add(object.identifier)
-                object.isDuplicate = True
-                object.identifier = object.identifier + '_' + str(HashDuplicateSuffix)
-                HashDuplicateSuffix += 1
-
-            self.hashes[object.identifier] = object
-
-    def __iter__(self):
-        return iter(self.hashes)
-
-    def findHash(self, desired):
-        if desired in self.hashes.keys():
-            return self.hashes[desired]
-        else:
-            return HashNonexistent()
-
-    def findHashByAttribute(self, attribute, value):
-        for hash in self.hashes.values():
-            # Search that object for its attribute
-            search = getattr(hash, attribute, False)
-            if value == search:
-                # If it matches the value, give them back the object to work with
-                return hash
-            else:
-                # Otherwise keep searching
-                continue
-        # And give them nothing if you legitimately have no search results
-        return HashNonexistent()
-
-    def findByOtherHash(self, hashType, hashValue):
-        for hash in self.hashes.values():
-            if not hash.recordedHashes:
-                continue
-            for k, v in hash.recordedHashes.items():
-                if k == hashType:
-                    if v == hashValue:
-                        return hash
-                    else:
-                        # Found the same hash type but it's not a matching value
-                        # Keep searching
-                        break
-                else:
-                    continue
-        return HashNonexistent()
-
-    def count(self):
-        return len(self.hashes)
-
-    def totalSize(self):
-        sum = 0
-        for h in self.hashes.values():
-            if h.sizeDefined:
-                sum += h.size
-        if self.originType == 'HASHLIST_PLAIN':
-            # Then there is no record of sizes
-            return None
-        else:
-            return sum
-
-
-class Hash(MHL):
-    def __init__(self, xmlObject, mhlIdentifier):
-        self.parentMHL = mhlIdentifier
-
-        # Debug: print('xml',xmlObject, type(xmlObject))
-
-        if xmlObject['file']:
-            self.recordedHashes = {}
-            self.isDuplicate = False
-
-            # Path operations
-            self.filepath = xmlObject['file']
-            path = os.path.split( self.filepath )
-            if path[0]:
-                # If inside a folder
-                self.directory = path[0]
-            else:
-                # If not, indicate clearly that it is at the root
-                self.directory = "/"
-            self.filename = path[1]
-        else:
-            # For some reason, the <hash> entry is missing a <file> attribute
-            # Probably should throw an error and let the user know their MHL is malformed
-            self.filepath = False
-
-
-        xmlObjectKeys = xmlObject.keys()
-
-        if 'size' in xmlObjectKeys:
-            if xmlObject['size']:
-                self.sizeDefined = True
-                self.size = int( xmlObject['size'] )
-                self.sizeHuman = humanSize(self.size)
-            else:
-                # It's "None", unspecified
-                self.sizeDefined = False
-                self.size = None
-                self.sizeHuman = 'Not specified'
-
-        if 'lastmodificationdate' in xmlObjectKeys:
-            # Try do the date parsing, hopefully without errors
-            modDate = dateutilParser.parse( xmlObject['lastmodificationdate'] )
-            if modDate.tzinfo is None:
-                self.lastmodificationdate = modDate.replace(tzinfo=tzutc())
-            else:
-                self.lastmodificationdate = modDate
-
-        if 'creationdate' in xmlObjectKeys:
-            self.creationdate = dateutilParser.parse( xmlObject['creationdate'] )
-        if 'hashdate' in xmlObjectKeys:
-            self.hashdate = dateutilParser.parse( xmlObject['hashdate'] )
-
-        # Now, we search for acceptable hash types
-        # And because our preferred hash is first in the list, it gets assigned as the identifier
-        identifierAlreadyFound = False
-        for ht in HASH_TYPES_ACCEPTABLE:
-            if ht in xmlObjectKeys:
-                # Record all acceptable hashes
-                self.recordedHashes[ht] = xmlObject[ht].lower()
-
-                if ht == 'xxhash64' and 'xxhash64be' not in self.recordedHashes:
-                    # Then the hash is LE
-                    # Convert it immediately to xxhash64be
-                    BE = hashConvertEndian( xmlObject[ht] )
-                    # Make the BE the identifier
-                    identifier = BE
-                    identifierType = 'xxhash64be'
-
-                    # But also add the BE to recordedHashes
-                    self.recordedHashes['xxhash64be'] = BE
-                else:
-                    identifier = xmlObject[ht].lower()
-                    identifierType = ht
-
-                # But also grab an identifier at the same time
-                if identifierAlreadyFound:
-                    continue
-                else:
-                    self.identifier = identifier
-                    self.identifierType = identifierType
-                    identifierAlreadyFound = True
-
-    def __eq__(self, comparison):
-        if self.identifier == comparison.identifier:
-            return True
-        else:
-            return False
-
-    def __ne__(self, comparison):
-        if self.identifier == comparison.identifier:
-            return False
-        else:
-            return True
-
-    def __hash__(self):
-        return hash( self.identifier )
-
-    def __str__(self):
-        # By default, print the Identifier
-        return self.identifier
-
-    def __lt__(self, other):
-        # Aid in sorting by filepath
-        return self.filepath < other.filepath
-
-
-class HashNonexistent:
-    def __getattr__(self, attribute):
-        return None
-
-    def __setattr__(self, attribute):
-        return None
-
-
-class Comparison:
-    def __init__(self, mhlA, mhlB):
-        self.A = mhlA
-        self.B = mhlB
-
-        setA = { xmlObject for xmlObject in self.A.hashes.values() }
-        setB = { xmlObject for xmlObject in self.B.hashes.values() }
-
-        deltaA = setA - setB
-        deltaB = setB - setA
-        setA_filtered = setA - deltaA
-        setB_filtered = setB - deltaB
-
-        self.deltaA = sorted(deltaA)
-        self.deltaB = sorted(deltaB)
-
-        common = zip(setA_filtered, setB_filtered)
-        self.common = sorted(common)
-
-        # Define the categories of outcomes.
-        count_values = [
-            'PERFECT',  # Match hash and all filesystem attributes
-            'MINOR',  # Match hash but one or more filesystem attributes are different
-            'HASH_TYPE_DIFFERENT',  # Hash type is different, cannot be compared
-            'HASH_CHANGED',  # Hash is different, indicating a file change
-            'MISSING',  # Exists only in one list or the other
-            'DUPLICATE',  # When there are multiple files listed with exactly the same hash
-            'IMPOSSIBLE'  # For anomalies (like hash the same but size different)
-            ]
-        # Create a place to store these numbers as we go along.
-        self.COUNT = {}
-        for v in count_values:
-            self.COUNT[v] = 0
-
-    def checkCommon(self):
-
-        for hashA, hashB in self.common:
-            beenCounted = False
-
-            diff = DictDiffer( hashA.__dict__, hashB.__dict__ )
-            dAdded = diff.added()
-            dRemoved = diff.removed()
-            dChanged = diff.changed()
-            dUnchanged = diff.unchanged()
-
-            if { 'filename', 'directory', 'size' }.issubset(dUnchanged):
-                # If neither of these variables have changed, then we have a perfect match.
-                # Report it and move on.
-                if not beenCounted:
-                    self.COUNT['PERFECT'] += 1
-                    beenCounted = True
-                continue
-
-            if 'filename' in dChanged:
-                if not beenCounted:
-                    self.COUNT['MINOR'] += 1
-                    beenCounted = True
-                logDetail( '  ' + color( hashA.filename, 'green', attrs=LOG_COLOR_BOLD ) )
-                logDetail( '      Filename: different (1st):', color( hashA.filename, LOG_COLOR_MHL_A ) )
-                logDetail( '                          (2nd):', color( hashB.filename, LOG_COLOR_MHL_B ) )
-            else:
-                logDetail( '  ' + color( hashA.filename, None, attrs=LOG_COLOR_BOLD ) )
-            if 'directory' in dChanged:
-                if not beenCounted:
-                    self.COUNT['MINOR'] += 1
-                    beenCounted = True
-                logDetail( '      Path: different (1st):', color( hashA.directory, LOG_COLOR_MHL_A ) )
-                logDetail( '                      (2nd):', color( hashB.directory, LOG_COLOR_MHL_B ) )
-            else:
-                logDetail( '      Path: identical: ' + hashA.directory )
-
-            # Straight up print the hash, don't check it.
-            # At this stage, it's not possible for the hash to be different.
-            # A check has already been performed for the pair to even be included in this group.
-            logDetail( '      Hash: identical: {} ({})'.format( hashA.identifier, hashA.identifierType ) )
-
-            if 'size' in dChanged:
-                # First, check if the Size is simply "Not specified"
-                if hashA.sizeDefined == False or hashB.sizeDefined == False:
-                    self.COUNT['PERFECT'] += 1
-                    beenCounted = True
-
-                # It is an anomaly if the size has changed, but not the hash.
-                # Report it as impossible, but also print it to the user anyway.
-                if not beenCounted:
-                    self.COUNT['IMPOSSIBLE'] += 1
-                    beenCounted = True
-                logDetail( '      Size: different (1st):', color( hashA.sizeHuman, LOG_COLOR_MHL_A ) )
-                logDetail( '                      (2nd):', color( hashB.sizeHuman, LOG_COLOR_MHL_B ) )
-            else:
-                logDetail( '      ' + 'Size: identical: ' + hashA.sizeHuman )
-
-            if 'lastmodificationdate' in dChanged:
-                if LOG_SHOW_DATES:
-                    if not beenCounted:
-                        self.COUNT['MINOR'] += 1
-                        beenCounted = True
-                    logDetail(
-                        '      Modified date: different (1st):',
-                        color( hashA.lastmodificationdate, LOG_COLOR_MHL_A )
-                     )
-                    logDetail(
-                        '                               (2nd):',
-                        color( hashB.lastmodificationdate, LOG_COLOR_MHL_B )
-                    )
-                else:
-                    # Don't count date changes unless user wants it (LOG_SHOW_DATES is true)
-                    pass
-
-            # Briefly explain to the user what attributes were added/removed
-            if LOG_SHOW_DATES == False:
-                dAddedFiltered = [ i for i in dAdded if i not in LIST_OF_DATE_ATTRIBUTES ]
-                dRemovedFiltered = [ i for i in dRemoved if i not in LIST_OF_DATE_ATTRIBUTES ]
-            else:
-                dAddedFiltered = dAdded
-                dRemovedFiltered = dRemoved
-
-            if len(dAddedFiltered) > 0:
-                dAddedString = ', '.join( str(i) for i in dAddedFiltered )
-                logDetail(
-                    '      These attributes exist in 1st only:',
-                    color(dAddedString, LOG_COLOR_MHL_A )
-                )
-            if len(dRemovedFiltered) > 0:
-                dRemovedString = ', '.join( str(i) for i in dRemovedFiltered )
-                logDetail(
-                    '      These attributes exist in 2nd only:',
-                    color(dRemovedString, LOG_COLOR_MHL_B )
-                )
-
-    def checkDelta(self, letter):
-        if letter == 'A':
-            delta = self.deltaA
-            # Refer to the opposite MHL to access and perform searches on it
-            oppositeMHL = self.B
-
-            listLetter = 'A'
-            listLabel = '1st'
-            listLabelOpposite = '2nd'
-            listColor = LOG_COLOR_MHL_A
-            listColorOpposite = LOG_COLOR_MHL_B
-        elif letter == 'B':
-            delta = self.deltaB
-            oppositeMHL = self.A
-
-            listLetter = 'B'
-            listLabel = '2nd'
-            listLabelOpposite = '1st'
-            listColor = LOG_COLOR_MHL_B
-            listColorOpposite = LOG_COLOR_MHL_A
-        else:
-            raise Exception("INTERNAL: Couldn't check deltas, none were specified. Specify one")
-            return
-
-        # Quickly clean Nonexistent objects out if they exist
-        deltaClean = [ h for h in delta if not isinstance(h, HashNonexistent) ]
-        deltaClean.sort()
-
-        for hash in deltaClean:
-
-            # Debug
-            # print(color('DEBUG >>>', 'yellow'), hash.identifier, color(hash.filename, 'green'))
-            # print('rh', hash.recordedHashes)
-
-            foundHashPossible = None
-            beenCounted = False  # If this hash has been counted yet
-
-            # Look for a match by other hash
-            # E.g., if XXHASH and MD5 present, search by MD5
-            for otherHashType, otherHashValue in hash.recordedHashes.items():
-                if otherHashType == hash.identifierType:
-                    pass  # Skip the hash type we are already using
-
-                hashPossible = oppositeMHL.findByOtherHash( otherHashType, otherHashValue )
-                if isinstance(hashPossible, HashNonexistent):
-                    # No result found, move on
-                    foundHashPossible = False
-                    pass
+        print('--------------')
+        print(LOG_STARTUP_LINE)
+
+
+    if args.verbose and not args.json:
+        settings.LOG_VERBOSE = True
+    if args.binary:
+        settings.LOG_SIZE_FORMAT = 'binary'
+    if args.dates:
+        settings.LOG_SHOW_DATES = True
+    if args.no_cache:
+        settings.CACHE_ENABLED = False
+    if args.interval is not None:
+        settings.FOLLOW_INTERVAL = args.interval
+
+    if args.profile_json:
+        profiler = Profiler(args.profile_json)
+    elif args.profile:
+        profiler = Profiler('-')
+    else:
+        profiler = Profiler()
+
+
+    try:
+        if args.scan:
+            # Compare every MHL on one volume against its counterpart on the other
+            if len(args.FILEPATH) != 2:
+                raise Exception('\n\nYou have specified {} folders. Scanning compares two volumes, specify exactly two.'.format(len(args.FILEPATH)))
+            for folder in args.FILEPATH:
+                if not os.path.isdir(folder):
+                    raise FileNotFoundError('\n\nCould not find this folder to scan. Check the path for typos?\n{}'.format(folder))
+
+            with profiler.phase('find'):
+                compare = VolumeComparison(args.FILEPATH[0], args.FILEPATH[1], jobs=args.jobs)
+            with profiler.phase('render'):
+                compare.printInfo()
+            with profiler.phase('compare'):
+                compare.checkAll()
+            with profiler.phase('render'):
+                compare.printCount()
+
+        elif args.verify:
+            # Hash the files on disk again, and compare them with what the MHL says they should be
+            filepath = args.FILEPATH[0]
+            if not os.path.isfile(filepath) and not isSidecarSource(filepath):
+                raise FileNotFoundError('\n\nCould not find this MHL file. Check the path for typos?\n{}'.format(filepath))
+            if not os.path.isdir(args.verify):
+                raise FileNotFoundError('\n\nCould not find this folder to verify. Check the path for typos?\n{}'.format(args.verify))
+
+            with profiler.phase('load'):
+                MHL_FILE = loadMHL(filepath)
+            with profiler.phase('hash'):
+                compare = VerifyComparison(MHL_FILE, args.verify, jobs=args.jobs)
+            if not settings.LOG_JSON:
+                with profiler.phase('render'):
+                    compare.printInfo()
+            with profiler.phase('compare'):
+                compare.checkAll()
+            with profiler.phase('render'):
+                if settings.LOG_JSON:
+                    compare.recordSummary()
                 else:
-                    # Found it
-                    # And because we found it by another hash...
-                    # Let's update the IDENTIFIER. Risky?
-                    hash.identifier = otherHashValue
-                    hash.identifierType = otherHashType
-                    hashPossible.identifier = otherHashValue
-                    hashPossible.identifierType = otherHashType
-                    foundHashPossible = True
-                    break
-
-            if foundHashPossible is False:
-                # Searched but no matches by other hash.
-                # Look for a match by filename
-                hashPossible = oppositeMHL.findHashByAttribute( 'filename', hash.filename )
-
-                if isinstance(hashPossible, HashNonexistent):
-                    # Definitely missing. No other matches by name or hash.
-                    foundHashPossible = False
+                    compare.printCount()
+
+        elif args.stat:
+            # Only look at which files are there and their sizes, nothing is read
+            filepath = args.FILEPATH[0]
+            if not os.path.isfile(filepath) and not isSidecarSource(filepath):
+                raise FileNotFoundError('\n\nCould not find this MHL file. Check the path for typos?\n{}'.format(filepath))
+            if not os.path.isdir(args.stat):
+                raise FileNotFoundError('\n\nCould not find this folder to check. Check the path for typos?\n{}'.format(args.stat))
+
+            with profiler.phase('load'):
+                MHL_FILE = loadMHL(filepath)
+            with profiler.phase('find'):
+                compare = StatComparison(MHL_FILE, args.stat, jobs=args.jobs)
+            if not settings.LOG_JSON:
+                with profiler.phase('render'):
+                    compare.printInfo()
+            with profiler.phase('compare'):
+                compare.checkAll()
+            with profiler.phase('render'):
+                if settings.LOG_JSON:
+                    compare.recordSummary()
                 else:
-                    foundHashPossible = True
-
-            if foundHashPossible is True:
-                # Compare the hash and the possible hash.
-                diff = DictDiffer(hash.__dict__, hashPossible.__dict__)
-                dAdded = diff.added()
-                dRemoved = diff.removed()
-                dUnchanged = diff.unchanged()
-                dChanged = diff.changed()
-
-                # First print a filename so everything fits underneath it.
-                logDetail( '  ' + color( hash.filename, None, attrs=LOG_COLOR_BOLD ) )
-
-                # Then begin testing.
-                if hash.identifierType == hashPossible.identifierType:
-                    # Hash type is the same
-                    if hash.identifier == hashPossible.identifier:
-                        # And so are the hashes
-
-                        # But check if it's a duplicate first
-                        if hash.isDuplicate is True:
-                            logDetail('      This file is a duplicate. Another file exists in this MHL with the same hash.')
-                            if not beenCounted:
-                                self.COUNT['DUPLICATE'] += 1
-                                beenCounted = True
-                            logDetail(
-                                '      Hash ({}):'.format(listLabel),
-                                colored(hash.identifier + ' ({})'.format(hash.identifierType), listColor)
-                            )
+                    compare.printCount()
+
+        elif len(args.FILEPATH) == 1:
+            # Print a summary of just this file
+            filepath = args.FILEPATH[0]
+            if not os.path.isfile(filepath) and not isSidecarSource(filepath):
+                raise FileNotFoundError('\n\nCould not find this MHL file. Check the path for typos?\n{}'.format(filepath))
+
+            with profiler.phase('load'):
+                MHL = loadMHL(filepath)
+
+            with profiler.phase('render'):
+                def keyfunc(x):
+                    return x.directory
+
+                MHL_items = sorted(MHL.hashes.values())
+                for dir, items in itertools.groupby(MHL_items, keyfunc):
+                    print(color(dir, 'green', attrs=LOG_COLOR_BOLD) + ':')
+                    for item in items:
+                        print_filename = '  > ' + item.filename
+                        if item.sizeDefined:
+                            print_size = item.sizeHuman
                         else:
-                            if not beenCounted:
-                                self.COUNT['PERFECT'] += 1
-                                beenCounted = True
-                            logDetail('      Hash: identical.')
-                    else:
-                        # But the hashes are different. File has changed?
-                        if not beenCounted:
-                            self.COUNT['HASH_CHANGED'] += 1
-                            beenCounted = True
-                        logDetail( color('      Hash: These hashes are different from each other. It is likely the files were different between the time the MHLs were generated.', LOG_COLOR_WARNING ) )
-                else:
-                    # Hash type is not the same. Unlikely to be comparable.
-                    if not beenCounted:
-                        self.COUNT['HASH_TYPE_DIFFERENT'] += 1
-                        beenCounted = True
-                    logDetail(color("      Hash: These hashes are of different types. It's not possible to compare them.", LOG_COLOR_INFORMATION))
-
-                if hash.isDuplicate is False:
-                    logDetail(
-                        '      Hash ({}):'.format(listLabel),
-                        color(
-                            '{} ({})'.format(hash.identifier, hash.identifierType), listColor
-                        )
-                    )
-                    logDetail(
-                        '      Hash ({}):'.format(listLabelOpposite),
-                        color(
-                            '{} ({})'.format(hashPossible.identifier, hashPossible.identifierType),
-                            listColorOpposite
+                            # Don't tack on the size if it's not defined
+                            print_size = ""
+                        print_log_detail_to_add = '\t{} {}'.format(
+                            color('({})'.format( showDigest(item.identifier) ), 'yellow'),
+                            print_size
                         )
-                    )
-
-                if { 'filename', 'directory', 'size' }.issubset(dUnchanged):
-                    # If neither of these variables have changed, then we have a perfect match.
-                    # EVEN THOUGH we used a slightly different preferred hash.
-                    if not beenCounted:
-                        self.COUNT['PERFECT'] += 1
-                        beenCounted = True
-                    continue
-                else:
-
-                    if 'filename' in dChanged:
-                        if not beenCounted:
-                            self.COUNT['MINOR'] += 1
-                            beenCounted = True
-                        logDetail( '      Filename: different (1st):', color( hash.filename, LOG_COLOR_MHL_A ) )
-                        logDetail( '                          (2nd):', color( hashPossible.filename, LOG_COLOR_MHL_B ) )
-                    else:
-                        # If the filename is the same, it has already been declared closer to the top.
-                        pass
-
-                    if 'directory' in dChanged:
-                        if not beenCounted:
-                            self.COUNT['MINOR'] += 1
-                            beenCounted = True
-                        logDetail( '      Path: different (1st):', color( hash.directory, LOG_COLOR_MHL_A ) )
-                        logDetail( '                      (2nd):', color( hashPossible.directory, LOG_COLOR_MHL_B ) )
-                    else:
-                        logDetail( '      Path: identical:', hash.directory )
-
-                    if 'size' in dChanged:
-                        # First, check if the Size is simply "Not specified"
-                        # This is not an anomaly if so.
-                        if hash.sizeDefined == False:
-                            # If we have come this far (hash match, name, directory) but size can't be compared
-                            # That is as good as we are gonna get.
-                            self.COUNT['PERFECT'] += 1
-                            beenCounted = True
-                        else:
-                            # It is an anomaly if the size has changed while the hash has not.
-                            # Report it as impossible, but also print it to the user anyway.
-                            if not beenCounted:
-                                self.COUNT['IMPOSSIBLE'] += 1
-                                beenCounted = True
-                            logDetail( '      Size: different (1st):', color( hash.sizeHuman, LOG_COLOR_MHL_A ) )
-                            logDetail( '                      (2nd):', color( hashPossible.sizeHuman, LOG_COLOR_MHL_B ) )
-                    else:
-                        logDetail( '      ' + 'Size: identical: ' + hashPossible.sizeHuman )
-
-                    if 'lastmodificationdate' in dChanged:
-                        if LOG_SHOW_DATES:
-                            if not beenCounted:
-                                self.COUNT['MINOR'] += 1
-                                beenCounted = True
-
-                            hModDate = showDate(hash.lastmodificationdate)
-                            hPModDate = showDate(hashPossible.lastmodificationdate)
-
-                            logDetail( '      Modified date: different (1st):', color( hModDate, LOG_COLOR_MHL_A ) )
-                            logDetail( '                               (2nd):', color( hPModDate, LOG_COLOR_MHL_B ) )
+                        if settings.LOG_VERBOSE == True:
+                            print(print_filename + print_log_detail_to_add)
                         else:
-                            # Don't count date changes unless user wants it (LOG_SHOW_DATES is true)
-                            pass
-
-                    # Briefly explain to the user what attributes were added/removed
-                    if LOG_SHOW_DATES == False:
-                        dAddedFiltered = [ i for i in dAdded if i not in LIST_OF_DATE_ATTRIBUTES ]
-                        dRemovedFiltered = [ i for i in dRemoved if i not in LIST_OF_DATE_ATTRIBUTES ]
-                    else:
-                        dAddedFiltered = dAdded
-                        dRemovedFiltered = dRemoved
-
-                    if len(dAddedFiltered) > 0:
-                        dAddedString = ', '.join( str(i) for i in dAddedFiltered )
-                        logDetail(
-                            '      These attributes exist in 1st only:',
-                            color(dAddedString, LOG_COLOR_MHL_A )
-                        )
-                    if len(dRemovedFiltered) > 0:
-                        dRemovedString = ', '.join( str(i) for i in dRemovedFiltered )
-                        logDetail(
-                            '      These attributes exist in 2nd only:',
-                            color(dRemovedString, LOG_COLOR_MHL_B )
-                        )
-
-                    pass
-
+                            print(print_filename)
+
+                        # Show date information, if user requests
+                        if settings.LOG_SHOW_DATES:
+                            for attrib in LIST_OF_DATE_ATTRIBUTES:
+                                if hasattr(item, attrib):
+                                    logDetail( '        {:<20}:'.format(attrib), getattr(item, attrib))
+                    # After each directory, line break
+                    print()
+                print('--------------')
+                # Summarise the MHL
+                if MHL.totalSize():
+                    total_size_display = humanSize( MHL.totalSize(), showBytes=True ) + ' in total'
+                else:
+                    total_size_display = 'No filesize information was present'
+                print('{} files, {}'.format(MHL.count(), total_size_display))
+
+
+        elif len(args.FILEPATH) == 2:
+            # Our main comparison will take place with 2 files.
+            # Check the paths exist first.
+            for filepath in args.FILEPATH:
+                if not os.path.isfile(filepath) and not isSidecarSource(filepath):
+                    raise FileNotFoundError('\n\nCould not find this MHL file. Check the path for typos?\n{}'.format(filepath))
+            # Then define our A and B files.
+            filepath_A = args.FILEPATH[0]
+            filepath_B = args.FILEPATH[1]
+
+            if args.memory_limit is not None:
+                # Neither is read into memory, they are sorted on disk and compared from there
+                with tempfile.TemporaryDirectory(prefix='mhl-compare-') as directory:
+                    with profiler.phase('sort'):
+                        compare = SortedComparison(filepath_A, filepath_B, directory, args.memory_limit * 1024 * 1024)
+                    if not settings.LOG_JSON:
+                        with profiler.phase('render'):
+                            compare.printInfo()
+                    with profiler.phase('checkAll'):
+                        compare.checkAll()
+            elif args.follow:
+                with profiler.phase('load A'):
+                    MHL_FILE_A = loadMHL(filepath_A)
+
+                # B is read, joined and checked a bit at a time as it is written
+                MHL_FILE_B = FollowedMHL(filepath_B)
+                with profiler.phase('join'):
+                    compare = FollowComparison(MHL_FILE_A, MHL_FILE_B)
+                if not settings.LOG_JSON:
+                    with profiler.phase('render'):
+                        compare.printInfo()
+                with profiler.phase('follow'):
+                    compare.follow()
+                with profiler.phase('checkDelta A'):
+                    compare.checkDelta('A')
             else:
-                # Else if foundHashPossible was False.
-                self.COUNT['MISSING'] += 1
-                logDetail('  ' + color(hash.filename, listColor, attrs=LOG_COLOR_BOLD))
-                logDetail(
-                    '  This file only exists in',
-                    color(listLabel + ' MHL', listColor) + '.'
-                )
-                logDetail( '      ' + 'Path:', hash.directory )
-                logDetail( '      ' + 'Size:', hash.sizeHuman )
-                logDetail( '      ' + 'Hash:', hash.identifier, '({})'.format(hash.identifierType ) )
-
-    def printInfo(self):
-        count_files_A = str( self.A.count() ) + " files"
-        count_files_B = str( self.B.count() ) + " files"
-
-
+                with profiler.phase('load A'):
+                    MHL_FILE_A = loadMHL(filepath_A)
+                with profiler.phase('load B'):
+                    MHL_FILE_B = loadMHL(filepath_B)
+
+                with profiler.phase('join'):
+                    compare = Comparison(MHL_FILE_A, MHL_FILE_B)
+                if not settings.LOG_JSON:
+                    with profiler.phase('render'):
+                        compare.printInfo()
+                with profiler.phase('checkCommon'):
+                    compare.checkCommon()
+                with profiler.phase('checkDelta A'):
+                    compare.checkDelta('A')
+                with profiler.phase('checkDelta B'):
+                    compare.checkDelta('B')
+            with profiler.phase('render'):
+                if settings.LOG_JSON:
+                    compare.recordSummary()
+                else:
+                    compare.printCount()
 
-        if self.A.originType == 'HASHLIST_PLAIN':
-            displayed_size_A = 'Size not specified (file is a simple list of checksums)'
         else:
-            displayed_size_A = humanSize(self.A.totalSize(), showBytes=True)
-        if self.B.originType == 'HASHLIST_PLAIN':
-            displayed_size_B = 'Size not specified (file is a simple list of checksums)'
+            # Three or more files: check them all against each other at once.
+            for filepath in args.FILEPATH:
+                if not os.path.isfile(filepath) and not isSidecarSource(filepath):
+                    raise FileNotFoundError('\n\nCould not find this MHL file. Check the path for typos?\n{}'.format(filepath))
+
+            MHL_FILES = []
+            for filepath, label in zip( args.FILEPATH, itertools.count(1) ):
+                with profiler.phase('load ' + ordinal(label)):
+                    MHL_FILES.append( loadMHL(filepath) )
+
+            with profiler.phase('join'):
+                compare = MultiComparison(MHL_FILES)
+            with profiler.phase('render'):
+                compare.printInfo()
+            with profiler.phase('checkAll'):
+                compare.checkAll()
+            with profiler.phase('render'):
+                compare.printCount()
+    except EmptyHashlist as error:
+        # Nothing to compare
+        if settings.LOG_JSON:
+            # Still one JSON object per line
+            logRecord({
+                'type': 'error',
+                'message': ' '.join( str(error).split() ),
+            })
         else:
-            displayed_size_B = humanSize(self.B.totalSize(), showBytes=True)
-
-        print('')
-        if LOG_VERBOSE:
-            print('Summary:')
-        print('1st MHL file:', color(self.A.filepath, LOG_COLOR_MHL_A) )
-        print('             ', color(count_files_A, LOG_COLOR_MHL_A) )
-        print('             ', color(displayed_size_A, LOG_COLOR_MHL_A) )
-        print('2nd MHL file:', color(self.B.filepath, LOG_COLOR_MHL_B) )
-        print('             ', color(count_files_B, LOG_COLOR_MHL_B) )
-        print('             ', color(displayed_size_B, LOG_COLOR_MHL_B) )
-        return
-
-    def printCount(self):
-        outcomes = {
-            'PERFECT': {
-                'desc': 'matched perfectly'
-                },
-            'MINOR': {
-                'desc': 'matched (but with differences in name or directory)'
-                },
-            'HASH_TYPE_DIFFERENT': {
-                'desc': 'had incomparable hash types and could not be compared',
-                'color': LOG_COLOR_INFORMATION
-                },
-            'HASH_CHANGED': {
-                'desc': 'had different hashes. The files were likely different at the time the MHLs were generated',
-                'desc_singular': 'had different hashes. The file was likely different at the time the MHLs were generated',
-                'color': LOG_COLOR_WARNING
-                },
-            'MISSING': {
-                'desc': 'were present only in one MHL or the other',
-                'desc_singular': 'was present only in one MHL or the other'
-                },
-            'IMPOSSIBLE': {
-                'desc': 'anomaly -- MHL was likely modified or something unusual happened'
-                },
-            'DUPLICATE': {
-                'desc': 'were duplicates, as they had the same hash as other files',
-                'desc_singular': 'was a duplicate, as it had the same hash as another file'
-                },
-            'NO_FILES_IN_COMMON': {
-                'desc': 'There were no files in common between these two MHLs.'
-                }
-            }
-        for label in outcomes.values():
-            # If a singular description ('was' vs. 'were') is not defined, just use the regular description.
-            if 'desc_singular' not in label.keys():
-                label['desc_singular'] = label['desc']
-            # If a color is not defined, don't use any.
-            if 'color' not in label.keys():
-                label['color'] = None
-
-        print('')
-        print('Observations:')
-
-        # Quick check to see if both MHLs are completely and utterly different
-        # If all counts are zero, except missing, then there really was nothing in common.
-        sumCountsGenuine = sum( self.COUNT.values() ) - self.COUNT['MISSING']
-        if not sumCountsGenuine > 0:
-            print('    ' + color('There were NO files in common between these two MHL files.', LOG_COLOR_INFORMATION) )
-        for category, count in self.COUNT.items():
-            line_color = outcomes[category]['color']
-            if count == 0:
-                # Don't mention empty categories, not relevant
-                continue
-            elif count == 1:
-                count_words = str(count) + " file"
-                label_type = 'desc_singular'
-            else:
-                count_words = str(count) + " files"
-                label_type = 'desc'
-
-            print( color(
-                "    " + count_words + " " + outcomes[category][label_type],
-                line_color)
-            )
-        if not LOG_VERBOSE:
-            print('')
-            print('    Run the check again with --info to view details.')
+            print(error)
+        sys.exit(0)
 
-        # print( self.COUNT )
-        return
 
+    #####
 
-#####
-
-
-parser = argparse.ArgumentParser()
-parser.add_argument( "FILEPATH", nargs='+', help="Path to the first file")
-parser.add_argument(
-    "-v", "--verbose", "--info",
-    help="gives greater detail on all files affected",
-    action="store_true"
-)
-parser.add_argument(
-    "-b", "--binary",
-    help="Shows sizes in binary format, appropriate for Windows (1024 bytes = 1 KiB)",
-    action="store_true"
-)
-parser.add_argument(
-    "-d", "--dates",
-    help="Report on differences in modification date, creation date or hash date",
-    action="store_true"
-)
-args = parser.parse_args()
-
-
-if args.verbose:
-    LOG_VERBOSE = True
-if args.binary:
-    LOG_SIZE_FORMAT = 'binary'
-if args.dates:
-    LOG_SHOW_DATES = True
-
-
-if len(args.FILEPATH) == 1:
-    # Print a summary of just this file
-    filepath = args.FILEPATH[0]
-    if not os.path.isfile(filepath):
-        raise FileNotFoundError('\n\nCould not find this MHL file. Check the path for typos?\n{}'.format(filepath))
-
-    MHL = MHL(filepath)
-
-    def keyfunc(x):
-        return x.directory
-
-    MHL_items = sorted(MHL.hashes.values())
-    for dir, items in itertools.groupby(MHL_items, keyfunc):
-        print(color(dir, 'green', attrs=LOG_COLOR_BOLD) + ':')
-        for item in items:
-            print_filename = '  > ' + item.filename
-            if item.sizeDefined:
-                print_size = item.sizeHuman
-            else:
-                # Don't tack on the size if it's not defined
-                print_size = ""
-            print_log_detail_to_add = '\t{} {}'.format(
-                color('({})'.format(item.identifier), 'yellow'),
-                print_size
-            )
-            if LOG_VERBOSE == True:
-                print(print_filename + print_log_detail_to_add)
-            else:
-                print(print_filename)
-
-            # Show date information, if user requests
-            if LOG_SHOW_DATES:
-                for attrib in LIST_OF_DATE_ATTRIBUTES:
-                    if hasattr(item, attrib):
-                        logDetail( '        {:<20}:'.format(attrib), getattr(item, attrib))
-        # After each directory, line break
-        print()
-    print('--------------')
-    # Summarise the MHL
-    if MHL.totalSize():
-        total_size_display = humanSize( MHL.totalSize(), showBytes=True ) + ' in total'
-    else:
-        total_size_display = 'No filesize information was present'
-    print('{} files, {}'.format(MHL.count(), total_size_display))
-
-
-elif len(args.FILEPATH) == 2:
-    # Our main comparison will take place with 2 files.
-    # Check the paths exist first.
-    for filepath in args.FILEPATH:
-        if not os.path.isfile(filepath):
-            raise FileNotFoundError('\n\nCould not find this MHL file. Check the path for typos?\n{}'.format(filepath))
-    # Then define our A and B files.
-    filepath_A = args.FILEPATH[0]
-    filepath_B = args.FILEPATH[1]
-
-    MHL_FILE_A = MHL(filepath_A)
-    MHL_FILE_B = MHL(filepath_B)
-
-    compare = Comparison(MHL_FILE_A, MHL_FILE_B)
-    compare.printInfo()
-    compare.checkCommon()
-    compare.checkDelta('A')
-    compare.checkDelta('B')
-    compare.printCount()
-
-else:
-    raise Exception('\n\nYou have specified {} files. Only two at a time are supported for comparison.\nDouble check you have not included any erroneous spaces in the file path.'.format(len(args.FILEPATH)))
-
-
-#####
-
-print('--------------')
+    if not settings.LOG_JSON:
+        print('--------------')